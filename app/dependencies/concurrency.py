@@ -0,0 +1,43 @@
+from fastapi import HTTPException, Depends, Request, status
+from typing import AsyncIterator, Optional
+
+from app.dependencies.auth import get_current_user, TokenData
+from app.services.rate_limit_service import rate_limit_service
+
+
+async def limit_concurrent_requests(
+    request: Request,
+    current_user: TokenData = Depends(get_current_user),
+) -> AsyncIterator[TokenData]:
+    """
+    Hold one of the user's in-flight analysis slots for the lifetime of the request
+    """
+    request_id = await rate_limit_service.acquire_concurrency_slot(current_user.email)
+    if request_id is None:
+        limit = rate_limit_service.concurrent_request_limit
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "success": False,
+                "message": f"You already have {limit} analyses in progress. Please wait for them to finish.",
+                "error": "CONCURRENT_LIMIT_EXCEEDED",
+                "concurrent_limit": limit,
+            },
+        )
+    request.state.concurrency_slot = request_id
+    try:
+        yield current_user
+    finally:
+        # Skipped when a streaming response took the slot over with take_concurrency_slot
+        if request.state.concurrency_slot is not None:
+            await rate_limit_service.release_concurrency_slot(current_user.email, request_id)
+
+
+def take_concurrency_slot(request: Request) -> Optional[str]:
+    """
+    Hand the request's slot to a response body that outlives the handler.
+    The caller must pass the returned id to release_concurrency_slot once done.
+    """
+    request_id = getattr(request.state, "concurrency_slot", None)
+    request.state.concurrency_slot = None
+    return request_id
@@ -1,8 +1,9 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from contextlib import asynccontextmanager
 import os
 
 try:
@@ -12,14 +13,29 @@ except ImportError:
     pass  
 
 from app.routers import resume_router
+from app.services.resume_parser import shutdown_extract_pool
 
 # Initialize global rate limiter for slowapi
-limiter = Limiter(key_func=get_remote_address)
+# Point RATE_LIMIT_STORAGE_URI at a shared store (e.g. redis://host:6379) so
+# limits hold across workers and replicas; defaults to per-process memory
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=os.getenv("RATE_LIMIT_STORAGE_URI", "memory://"),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop the resume text extraction workers so they do not outlive the server
+    shutdown_extract_pool()
+
 
 app = FastAPI(
     title="JobPsych ai",
     version="3.0.0",
     description="AI-powered resume analysis and job role recommendation service and HR interview question generation for HR professionals.",
+    lifespan=lifespan,
 )
 
 app.state.limiter = limiter
@@ -64,6 +64,17 @@ class CareerPathPrediction(BaseModel):
     timeline: str
     required_development: List[str]
 
+class FullAnalysis(BaseModel):
+    score: ResumeScore
+    personality: PersonalityInsights
+    career_path: CareerPathPrediction
+
+class ResumeAnalysisSections(BaseModel):
+    roleRecommendations: List[RoleRecommendation]
+    resumeScore: ResumeScore
+    personalityInsights: PersonalityInsights
+    careerPath: CareerPathPrediction
+
 
 class ResumeAnalysisResponse(BaseModel):
     resumeData: Optional[ResumeData] = None  # None for privacy-focused preparation system
@@ -75,6 +86,14 @@ class ResumeAnalysisResponse(BaseModel):
     preparationPlan: Optional[Dict[str, Any]] = None  # Role-specific preparation guidance
 
 
+class HiredeskAnalysisResponse(ResumeAnalysisResponse):
+    """Resume analysis plus the fit verdict for the best-fit role."""
+    success: bool = True
+    fit_status: str  # "fit" | "not fit"
+    reasoning: str
+    best_fit_role: str
+
+
 class CandidateSelectionResult(BaseModel):
     """Result for a single candidate in selection process."""
     candidate: str  # filename or candidate identifier
@@ -1,38 +1,179 @@
-from fastapi import APIRouter, UploadFile, HTTPException, Request, Form, File, Depends, status
+from fastapi import APIRouter, BackgroundTasks, UploadFile, HTTPException, Request, Response, Form, File, Depends, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import ValidationError
-from typing import Optional, List
+from typing import Awaitable, Callable, Dict, Optional, List
+import asyncio
+import contextlib
+import hashlib
 import logging
-from app.services.resume_parser import ResumeParser
+from io import BytesIO
+import os
+import orjson
+import traceback
+from functools import lru_cache, partial
+from itertools import chain
+from app.services.resume_parser import ResumeParser, PdfParseError, DocxParseError
 from app.services.advanced_analyzer import AdvancedAnalyzer
 from app.services.rate_limit_service import rate_limit_service
+from app.services.response_cache import response_cache
+from app.services.task_store import ASYNC_TASKS_ENABLED, task_store
 from app.services.candidate_selector import CandidateSelector
+from app.services.prompts.candidate_selection_service import CandidateSelectionService
 from app.services.prompts import (
     AnalyzeResumeService,
     HiredeskService,
     BatchAnalyzeService,
     CompareResumesService
 )
-from app.models.schemas import ResumeAnalysisResponse, ResumeData, Question, CandidateSelectionResponse, CandidateSelectionResult
+from app.models.schemas import ResumeAnalysisResponse, HiredeskAnalysisResponse, ResumeData, Question, CandidateSelectionResponse, CandidateSelectionResult
 from app.dependencies.auth import get_current_user, TokenData
+from app.dependencies.concurrency import limit_concurrent_requests, take_concurrency_slot
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
 logger = logging.getLogger(__name__)
 
-# Initialize rate limiter for this router
-limiter = Limiter(key_func=get_remote_address)
+# Initialize rate limiter for this router (shares storage with app.main's limiter)
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=os.getenv("RATE_LIMIT_STORAGE_URI", "memory://"),
+)
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Allowed resume extensions (lowercase, with the leading dot)
+_ALLOWED_EXTS = frozenset({".pdf", ".doc", ".docx"})
+
+
+def _valid_ext(filename: str) -> bool:
+    """Check the upload's extension against _ALLOWED_EXTS without lowercasing the whole name."""
+    i = filename.rfind(".")
+    return i != -1 and filename[i:].lower() in _ALLOWED_EXTS
+
+# User-facing messages for file errors, keyed by the parser's exception type
+_PARSE_ERROR_MESSAGES = (
+    (PdfParseError, "Error reading PDF file. Please ensure it's not corrupted or password protected."),
+    (DocxParseError, "Error reading DOCX file. Please ensure it's a valid Word document."),
+)
+_DEFAULT_ERROR_MESSAGE = "Analysis failed. Please try again."
+
+
+def _humanize_error(exc: Exception, default: str = _DEFAULT_ERROR_MESSAGE) -> str:
+    """Map an exception to a user-facing error message."""
+    return next((msg for exc_type, msg in _PARSE_ERROR_MESSAGES if isinstance(exc, exc_type)), default)
+
+
+_MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+_READ_CHUNK_SIZE = 64 * 1024
+
+
+async def _within_size_limit(file: UploadFile, digest=None, limit: int = _MAX_FILE_SIZE) -> bool:
+    """
+    Stream the upload in chunks and stop as soon as it exceeds limit, so an
+    oversized file is never fully buffered. Each chunk is fed to digest when
+    given. The file is rewound before returning.
+    """
+    if file.size is not None and file.size > limit:
+        return False
+    total = 0
+    while chunk := await file.read(_READ_CHUNK_SIZE):
+        total += len(chunk)
+        if total > limit:
+            await file.seek(0)
+            return False
+        if digest is not None:
+            digest.update(chunk)
+    await file.seek(0)
+    return True
+
+
+async def _buffered_upload(file: UploadFile, limit: int = _MAX_FILE_SIZE) -> UploadFile:
+    """
+    Copy an upload into memory so it survives the request's form cleanup.
+    Reads at most limit + 1 bytes, enough for _within_size_limit to still
+    reject an oversized file.
+    """
+    data = await file.read(limit + 1)
+    return UploadFile(BytesIO(data), size=len(data), filename=file.filename, headers=file.headers)
+
+
+@lru_cache(maxsize=None)
+def _shared(service_cls):
+    """Return a process-wide instance of a stateless service, built on first use."""
+    return service_cls()
+
+
+@lru_cache(maxsize=None)
+def _shared_candidate_selector() -> CandidateSelector:
+    """Process-wide CandidateSelector built on the shared parser and selection service."""
+    return CandidateSelector(
+        parser=_shared(ResumeParser),
+        selector_service=_shared(CandidateSelectionService),
+    )
+
+
+def _role_name(role) -> str:
+    """Role name from a RoleRecommendation or a plain string."""
+    return role if isinstance(role, str) else (getattr(role, "roleName", None) or str(role))
+
+
+def _question_text(question) -> Optional[str]:
+    """Question text from a raw LLM dict or a Question model."""
+    return question.get("question") if isinstance(question, dict) else getattr(question, "question", None)
+
+
+def _error_detail(message: str, error: str = "VALIDATION_ERROR", **extra) -> dict:
+    """Build the standard error payload used in HTTPException details."""
+    return {"success": False, "message": message, "error": error, **extra}
+
+
+def _sse_event(payload, event: Optional[str] = None) -> str:
+    """Format payload as one Server-Sent Event, optionally named."""
+    data = orjson.dumps(jsonable_encoder(payload)).decode()
+    return f"event: {event}\ndata: {data}\n\n" if event else f"data: {data}\n\n"
+
+
+async def _stream_sections(sections: Dict[str, Callable[[], Awaitable]]):
+    """
+    Yield one named event per analysis section in completion order, then a
+    done event. Sections are zero-arg factories started only once the stream
+    runs; any still running are cancelled if a section fails or the client
+    goes away.
+    """
+    async def _named(name: str, start: Callable[[], Awaitable]):
+        return name, await start()
+
+    tasks = [asyncio.ensure_future(_named(name, start)) for name, start in sections.items()]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            name, value = await finished
+            yield _sse_event(value, event=name)
+        yield _sse_event({"success": True}, event="done")
+    except Exception as e:
+        yield _sse_event(_error_detail(_humanize_error(e, default=str(e)), error="SERVER_ERROR"), event="error")
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Collect the cancelled sections so their errors are not reported as never retrieved
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _format_error_item(err: dict) -> str:
+    loc = err["loc"]
+    field = loc[-1] if loc else "Unknown field"
+    if isinstance(field, int):
+        parent = loc[-2] if len(loc) > 1 else "item"
+        field = f"{parent} #{field + 1}"
+    return f"{field}: {err['msg']}"
 
-router = APIRouter()
 
 def format_validation_error(error: ValidationError) -> str:
-    error_messages = []
-    for err in error.errors():
-        field = err["loc"][-1] if err["loc"] else "Unknown field"
-        if isinstance(field, int):
-            parent = err["loc"][-2] if len(err["loc"]) > 1 else "item"
-            field = f"{parent} #{field + 1}"
-        error_messages.append(f"{field}: {err['msg']}")
-    return "Validation Error: " + "; ".join(error_messages)
+    errors = error.errors()
+    if len(errors) == 1:
+        return "Validation Error: " + _format_error_item(errors[0])
+    return "Validation Error: " + "; ".join(_format_error_item(err) for err in errors)
 
 
 
@@ -45,40 +186,67 @@ async def analyze_resume(
     job_description: Optional[str] = Form(None)
 ):
     try:
-        parser = ResumeParser()
+        parser = _shared(ResumeParser)
         resume_data = await parser.parse(file)
         
         # Generate role recommendations with target role analysis
-        analyze_service = AnalyzeResumeService()
-        if target_role:
-            # Analyze fit for target role + provide alternatives
-            role_recommendations = await analyze_service.analyze_role_fit(resume_data, target_role, job_description)
-        else:
+        analyze_service = _shared(AnalyzeResumeService)
+        # Format the resume once; every prompt below reuses the same slices
+        profile = analyze_service.build_candidate_profile(resume_data)
+
+        def _recommendations():
+            if target_role:
+                # Analyze fit for target role + provide alternatives
+                return analyze_service.analyze_role_fit(
+                    resume_data, target_role, job_description, profile=profile
+                )
             # General role recommendations
-            role_recommendations = await analyze_service.generate(resume_data)
-        
-        # Calculate resume score, personality insights, and career path
-        resume_score = await analyze_service.calculate_resume_score(resume_data)
-        personality_insights = await analyze_service.analyze_personality(resume_data)
-        career_path = await analyze_service.predict_career_path(resume_data)
+            return analyze_service.generate(resume_data, profile=profile)
         
-        preparation_plan = None
-        if target_role:
+        async def _preparation_plan():
+            if not target_role:
+                return None
             try:
-                preparation_plan = await analyze_service.generate_role_preparation_plan(
-                    resume_data, target_role, job_description
+                return await analyze_service.generate_role_preparation_plan(
+                    resume_data, target_role, job_description, profile=profile
                 )
             except Exception as e:
                 print(f"Warning: Could not generate preparation plan: {str(e)}")
-                preparation_plan = None
+                return None
+
+        if "text/event-stream" in request.headers.get("accept", ""):
+            # Send each section as soon as its model call returns
+            return StreamingResponse(_stream_sections({
+                "roleRecommendations": _recommendations,
+                "resumeScore": partial(analyze_service.calculate_resume_score, resume_data, profile),
+                "personalityInsights": partial(analyze_service.analyze_personality, resume_data, profile),
+                "careerPath": partial(analyze_service.predict_career_path, resume_data, profile),
+                "preparationPlan": _preparation_plan
+            }), media_type="text/event-stream")
+
+        async def _analysis_sections():
+            try:
+                # One combined model call covers recommendations, score, personality and career path
+                return await analyze_service.analyze_all(
+                    resume_data, target_role, job_description, profile=profile
+                )
+            except Exception as e:
+                print(f"Warning: Combined analysis failed, falling back to per-section calls: {str(e)}")
+                return await analyze_service.analyze_all_parallel(
+                    resume_data, target_role, job_description, profile=profile
+                )
+
+        # The preparation plan does not depend on the other sections; generate it alongside them
+        sections, preparation_plan = await asyncio.gather(_analysis_sections(), _preparation_plan())
         
-        response = ResumeAnalysisResponse(
+        # Every field below is already a validated model, so skip re-validation
+        response = ResumeAnalysisResponse.model_construct(
             resumeData=None,
             questions=[],
-            roleRecommendations=role_recommendations,
-            resumeScore=resume_score,
-            personalityInsights=personality_insights,
-            careerPath=career_path,
+            roleRecommendations=sections.roleRecommendations,
+            resumeScore=sections.resumeScore,
+            personalityInsights=sections.personalityInsights,
+            careerPath=sections.careerPath,
             preparationPlan=preparation_plan
         )
         return response
@@ -89,24 +257,171 @@ async def analyze_resume(
             detail=format_validation_error(e)
         )
     except Exception as e:
-        error_message = str(e)
-        if "PDF" in error_message:
-            error_message = "Error reading PDF file. Please ensure it's not corrupted or password protected."
-        elif "DOCX" in error_message:
-            error_message = "Error reading DOCX file. Please ensure it's a valid Word document."
-        raise HTTPException(status_code=500, detail=error_message)
+        raise HTTPException(status_code=500, detail=_humanize_error(e, default=str(e)))
+
+
+async def _discard_task(task: asyncio.Task) -> None:
+    """Cancel a speculative task and wait for it so its outcome is never left unretrieved."""
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError, Exception):
+        await task
 
 
-@router.post("/hiredesk-analyze", response_model=ResumeAnalysisResponse, status_code=status.HTTP_200_OK)
+async def _run_hiredesk_analysis(
+    resume_data: dict,
+    target_role: str,
+    job_description: str,
+    user_email: str
+) -> HiredeskAnalysisResponse:
+    """Run role fit, interview questions and advanced analysis on a parsed resume."""
+    # Initialize hiredesk service for comprehensive analysis
+    hiredesk_service = _shared(HiredeskService)
+
+    # Format the resume once; every prompt below reuses the same slices
+    profile = hiredesk_service.build_candidate_profile(resume_data)
+    
+    # Get role recommendations, speculatively analyzing fit for the target
+    # role in parallel since it is usually the top recommendation
+    recommendations_task = asyncio.create_task(hiredesk_service.generate(resume_data, profile=profile))
+    fit_task = asyncio.create_task(
+        hiredesk_service.analyze_role_fit(resume_data, target_role, job_description, profile)
+    )
+    try:
+        role_recommendations = await recommendations_task
+    except Exception:
+        await _discard_task(fit_task)
+        raise
+    
+    # Pick the top recommended role as the best fit
+    best_fit_role = role_recommendations[0] if role_recommendations else target_role
+    
+    # Always use string for role name
+    best_fit_role_name = _role_name(best_fit_role)
+
+    # Analyze fit for the best-fit role, reusing the speculative result when it matches
+    if best_fit_role_name == target_role:
+        fit_result = await fit_task
+    else:
+        await _discard_task(fit_task)
+        fit_result = await hiredesk_service.analyze_role_fit(
+            resume_data, best_fit_role_name, job_description, profile
+        )
+    if isinstance(fit_result, dict):
+        fit_status = "fit" if fit_result.get("fit", False) else "not fit"
+        reasoning = fit_result.get("reasoning", "No reasoning provided.")
+    else:
+        fit_status = "fit" if fit_result else "not fit"
+        reasoning = "Analyzed based on resume data."
+
+    # Generate questions for the best-fit role and general resume
+    questions = []
+    try:
+        # General resume-based questions
+        general_questions_data = await hiredesk_service.generate_interview_questions(
+            resume_data, profile=profile
+        )
+        
+        # Role-specific questions if candidate is fit
+        role_questions_data = []
+        if fit_status == "fit":
+            role_questions_data = await hiredesk_service.generate_interview_questions(
+                resume_data, best_fit_role_name, job_description, profile
+            )
+        
+        # Combine and deduplicate questions, ignoring case and surrounding whitespace
+        seen = set()
+        questions = []
+        for q in chain(general_questions_data, role_questions_data):
+            q_text = _question_text(q)
+            if not q_text:
+                continue
+            key = q_text.strip().casefold()
+            if key in seen:
+                continue
+            seen.add(key)
+            questions.append(Question(**q) if isinstance(q, dict) else q)
+    except Exception:
+        questions = []
+
+    # Generate advanced analysis
+    advanced_analyzer = _shared(AdvancedAnalyzer)
+    resume_score, personality_insights, career_path = await advanced_analyzer.analyze_all(
+        resume_data, profile=profile
+    )
+
+    # resume_data is raw model output, so ResumeData still validates it; the
+    # remaining fields are already validated models
+    result = HiredeskAnalysisResponse.model_construct(
+        fit_status=fit_status,
+        reasoning=reasoning,
+        best_fit_role=best_fit_role_name,
+        resumeData=ResumeData(**resume_data),
+        questions=questions,
+        roleRecommendations=role_recommendations,
+        resumeScore=resume_score,
+        personalityInsights=personality_insights,
+        careerPath=career_path
+    )
+
+    # Charge the upload only once the response is built, so failed attempts are free
+    await rate_limit_service.increment_files_uploaded(user_email, 1)
+    return result
+
+
+async def _run_hiredesk_task(
+    task_id: str,
+    resume_data: dict,
+    target_role: str,
+    job_description: str,
+    user_email: str,
+    cache_key: str,
+    slot_id: Optional[str] = None
+) -> None:
+    """
+    Background wrapper around _run_hiredesk_analysis that records the outcome
+    in task_store. Transient Gemini errors are already retried per call by
+    generate_content, so the task itself runs once.
+    Holds the caller's concurrency slot (slot_id) until the task finishes.
+    """
+    task_store.update(task_id, "running")
+    try:
+        result = await _run_hiredesk_analysis(resume_data, target_role, job_description, user_email)
+        response_cache.set(cache_key, result)
+        task_store.update(task_id, "completed", result=result)
+    except Exception as e:
+        logger.exception("Hiredesk task %s failed", task_id)
+        task_store.update(task_id, "failed", error=_humanize_error(e))
+    finally:
+        # The reservation and slot were handed over by hiredesk_analyze
+        rate_limit_service.release_reservation("files_uploaded", user_email)
+        if slot_id is not None:
+            await rate_limit_service.release_concurrency_slot(user_email, slot_id)
+
+
+@router.post("/hiredesk-analyze", response_model=HiredeskAnalysisResponse, status_code=status.HTTP_200_OK)
 async def hiredesk_analyze(
     file: UploadFile,
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
     target_role: str = Form(...),
     job_description: str = Form(...),
-    current_user: TokenData = Depends(get_current_user)
+    async_mode: bool = Form(False),
+    current_user: TokenData = Depends(limit_concurrent_requests)
 ):
+    upload_reserved = False
     try:
-        # Check rate limit before processing
-        rate_limit_status = await rate_limit_service.check_user_upload_limit(current_user.email)
+        if async_mode and not ASYNC_TASKS_ENABLED:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=_error_detail(
+                    "async_mode is not available on this deployment. Send the request without it.",
+                    error="ASYNC_MODE_UNSUPPORTED"
+                )
+            )
+
+        # Check the rate limit and reserve this upload in one step
+        rate_limit_status = await rate_limit_service.check_and_reserve_upload_limit(current_user.email)
 
         if not rate_limit_status["allowed"]:
             raise HTTPException(
@@ -120,151 +435,99 @@ async def hiredesk_analyze(
                     "remaining": rate_limit_status["remaining"]
                 }
             )
+        upload_reserved = True
 
         if not file.filename:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail={
-                    "success": False,
-                    "message": "No file provided.",
-                    "error": "VALIDATION_ERROR"
-                }
+                detail=_error_detail("No file provided.")
             )
 
-        if not file.filename.lower().endswith(('.pdf', '.doc', '.docx')):
+        if not _valid_ext(file.filename):
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail={
-                    "success": False,
-                    "message": "Invalid file format. Please upload PDF, DOC, or DOCX files only.",
-                    "error": "VALIDATION_ERROR"
-                }
+                detail=_error_detail("Invalid file format. Please upload PDF, DOC, or DOCX files only.")
             )
 
-        file_content = await file.read()
-        if len(file_content) > 10 * 1024 * 1024:  # 10MB
+        content_hash = hashlib.blake2b(digest_size=16)
+        if not await _within_size_limit(file, content_hash):
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail={
-                    "success": False,
-                    "message": "File too large. Maximum size is 10MB.",
-                    "error": "VALIDATION_ERROR"
-                }
+                detail=_error_detail("File too large. Maximum size is 10MB.")
             )
 
-        # Reset file pointer for processing
-        await file.seek(0)
-        parser = ResumeParser()
+        # Serve repeated submissions of the same resume from cache
+        content_hash.update(f"\0{target_role}\0{job_description}".encode())
+        etag = f'"{content_hash.hexdigest()}"'
+        cache_key = response_cache.make_key(current_user.email, content_hash.hexdigest())
+        cached_response = response_cache.get(cache_key)
+        if cached_response is not None:
+            if request.headers.get("if-none-match") == etag:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+            response.headers["ETag"] = etag
+            return cached_response
+
+        parser = _shared(ResumeParser)
         resume_data = await parser.parse(file)
 
-        # Initialize hiredesk service for comprehensive analysis
-        hiredesk_service = HiredeskService()
-        
-        # Get role recommendations
-        role_recommendations = await hiredesk_service.generate(resume_data)
-        
-        # Pick the top recommended role as the best fit
-        best_fit_role = role_recommendations[0] if role_recommendations else target_role
-        
-        # Always use string for role name
-        if isinstance(best_fit_role, str):
-            best_fit_role_name = best_fit_role
-        elif hasattr(best_fit_role, 'roleName'):
-            best_fit_role_name = best_fit_role.roleName
-        else:
-            best_fit_role_name = str(best_fit_role)
-
-        # Analyze fit for the best-fit role
-        fit_result = await hiredesk_service.analyze_role_fit(resume_data, best_fit_role_name, job_description)
-        if isinstance(fit_result, dict):
-            fit_status = "fit" if fit_result.get("fit", False) else "not fit"
-            reasoning = fit_result.get("reasoning", "No reasoning provided.")
-        else:
-            fit_status = "fit" if fit_result else "not fit"
-            reasoning = "Analyzed based on resume data."
-
-        # Generate questions for the best-fit role and general resume
-        questions = []
-        try:
-            # General resume-based questions
-            general_questions_data = await hiredesk_service.generate_interview_questions(resume_data)
-            
-            # Role-specific questions if candidate is fit
-            role_questions_data = []
-            if fit_status == "fit":
-                role_questions_data = await hiredesk_service.generate_interview_questions(
-                    resume_data, best_fit_role_name, job_description
-                )
-            
-            # Combine and deduplicate questions
-            all_questions = general_questions_data + role_questions_data
-            seen = set()
-            questions = []
-            for q in all_questions:
-                q_text = q.get("question") if isinstance(q, dict) else getattr(q, "question", None)
-                if q_text and q_text not in seen:
-                    questions.append(Question(**q) if isinstance(q, dict) else q)
-                    seen.add(q_text)
-        except Exception:
-            questions = []
-
-        # Generate advanced analysis
-        advanced_analyzer = AdvancedAnalyzer()
-        resume_score = await advanced_analyzer.calculate_resume_score(resume_data)
-        personality_insights = await advanced_analyzer.analyze_personality(resume_data)
-        career_path = await advanced_analyzer.predict_career_path(resume_data)
-
-        response = ResumeAnalysisResponse(
-            resumeData=ResumeData(**resume_data),
-            questions=questions,
-            roleRecommendations=role_recommendations,
-            resumeScore=resume_score,
-            personalityInsights=personality_insights,
-            careerPath=career_path
-        )
-        # Increment filesUploaded counter for single file upload
-        await rate_limit_service.increment_files_uploaded(current_user.email, 1)
+        if async_mode:
+            task_id = task_store.create(current_user.email)
+            # Background tasks run after the concurrency dependency has exited,
+            # so the task keeps the slot and releases it when it finishes
+            background_tasks.add_task(
+                _run_hiredesk_task, task_id, resume_data, target_role,
+                job_description, current_user.email, cache_key,
+                take_concurrency_slot(request)
+            )
+            upload_reserved = False  # released by the background task
+            return ORJSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={"success": True, "task_id": task_id, "status": "queued"}
+            )
 
-        return {
-            "success": True,
-            "fit_status": fit_status,
-            "reasoning": reasoning,
-            "resumeData": response.resumeData,
-            "roleRecommendations": response.roleRecommendations,
-            "questions": response.questions,
-            "best_fit_role": best_fit_role_name,
-            "resumeScore": response.resumeScore,
-            "personalityInsights": response.personalityInsights,
-            "careerPath": response.careerPath
-        }
+        result = await _run_hiredesk_analysis(resume_data, target_role, job_description, current_user.email)
+        response_cache.set(cache_key, result)
+        response.headers["ETag"] = etag
+        return result
     except HTTPException:
         raise
     except ValidationError as e:
         raise HTTPException(
             status_code=422,
-            detail={
-                "success": False,
-                "message": format_validation_error(e),
-                "error": "VALIDATION_ERROR"
-            }
+            detail=_error_detail(format_validation_error(e))
         )
     except Exception as e:
-        error_message = str(e)
-        if "PDF" in error_message:
-            error_message = "Error reading PDF file. Please ensure it's not corrupted or password protected."
-        elif "DOCX" in error_message:
-            error_message = "Error reading DOCX file. Please ensure it's a valid Word document."
-        else:
-            error_message = "Analysis failed. Please try again."
-        
         raise HTTPException(
-            status_code=500, 
-            detail={
-                "success": False,
-                "message": error_message,
-                "error": "SERVER_ERROR"
-            }
+            status_code=500,
+            detail=_error_detail(_humanize_error(e), error="SERVER_ERROR")
+        )
+    finally:
+        if upload_reserved:
+            rate_limit_service.release_reservation("files_uploaded", current_user.email)
+
+
+@router.get("/tasks/{task_id}")
+async def get_task_status(
+    task_id: str,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Poll the status of a background analysis started with async_mode.
+    Status is one of: queued, running, completed, failed
+    """
+    task = task_store.get(task_id, current_user.email)
+    if task is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=_error_detail("Task not found", error="NOT_FOUND")
         )
+    return {
+        "success": task["status"] != "failed",
+        "task_id": task_id,
+        "status": task["status"],
+        "result": task["result"],
+        "error": task["error"]
+    }
 
 
 @router.post("/batch-analyze", response_model=dict, status_code=status.HTTP_200_OK)
@@ -273,7 +536,7 @@ async def batch_analyze_resumes(
     request: Request,
     target_role: Optional[str] = Form(None),
     job_description: Optional[str] = Form(None),
-    current_user: TokenData = Depends(get_current_user)
+    current_user: TokenData = Depends(limit_concurrent_requests)
 ):
     """
     Analyze multiple resumes in batch with rate limiting
@@ -284,6 +547,7 @@ async def batch_analyze_resumes(
     - Tracks: batch_analysis counter and filesUploaded counter
     Response includes batch summary and updated usage statistics
     """
+    reserved_files = 0
     try:
         user_email = current_user.email
         partial_upload = False
@@ -313,10 +577,12 @@ async def batch_analyze_resumes(
             )
 
         # ========== STEP 2: CHECK RATE LIMIT ==========
-        rate_limit_check = await rate_limit_service.check_batch_analysis_limit(
+        # Reserve the allowed files so concurrent batches cannot overshoot the limit
+        rate_limit_check = await rate_limit_service.check_and_reserve_batch_analysis_limit(
             user_email,
             len(files)
         )
+        reserved_files = rate_limit_check.get("files_allowed", 0)
 
         if not rate_limit_check["allowed"]:
 
@@ -362,156 +628,236 @@ async def batch_analyze_resumes(
             files_rejected = 0
 
         # ========== STEP 3: PROCESS FILES ==========
-        results = []
-        successful_files = []
-        failed_files = []
-        batch_service = BatchAnalyzeService()
+        # Keyed by file index; every file gets an entry before the response is built
+        results: Dict[int, dict] = {}
+        batch_service = _shared(BatchAnalyzeService)
+        parser = _shared(ResumeParser)
+        advanced_analyzer = _shared(AdvancedAnalyzer)
+
+        def _record_failure(index: int, file: UploadFile, e: Exception) -> None:
+            if isinstance(e, ValueError):
+                results[index] = {
+                    "file_name": file.filename,
+                    "status": "validation_error",
+                    "data": None,
+                    "error": str(e)
+                }
+                return
+
+            error_message = str(e)
+            print(f"DEBUG: Exception in batch_analyze for {file.filename}: {type(e).__name__}: {error_message}")
+            traceback.print_exc()
+
+            display_error = _humanize_error(
+                e,
+                default=error_message if "Failed to" in error_message else _DEFAULT_ERROR_MESSAGE
+            )
+
+            results[index] = {
+                "file_name": file.filename,
+                "status": "error",
+                "data": None,
+                "error": display_error
+            }
 
-        for file in files:
+        def _record_success(index: int, file: UploadFile, prepared: tuple, analysis: tuple) -> None:
+            resume_data, _, role_recommendations = prepared
+            resume_score, personality_insights, career_path = analysis
+            response = ResumeAnalysisResponse.model_construct(
+                resumeData=ResumeData(**resume_data),
+                questions=[], 
+                roleRecommendations=role_recommendations,
+                resumeScore=resume_score,
+                personalityInsights=personality_insights,
+                careerPath=career_path
+            )
+
+            results[index] = {
+                "file_name": file.filename,
+                "status": "success",
+                "data": response,
+                "error": None
+            }
+
+        async def _prepare_one(index: int, file: UploadFile) -> Optional[tuple]:
+            """Validate, parse and recommend roles for one file; None if it failed"""
             try:
                 if not file.filename:
                     raise ValueError("No filename provided")
 
-                if not file.filename.lower().endswith(('.pdf', '.doc', '.docx')):
+                if not _valid_ext(file.filename):
                     raise ValueError("Invalid file format. Please upload PDF, DOC, or DOCX files only.")
 
-                file_content = await file.read()
-                if len(file_content) > 10 * 1024 * 1024:
+                if not await _within_size_limit(file):
                     raise ValueError("File too large. Maximum size is 10MB.")
 
-                # Reset file pointer for processing
-                await file.seek(0)
-
                 # Parse resume
-                parser = ResumeParser()
                 resume_data = await parser.parse(file)
 
+                # Format the resume once and share it across every prompt for this file
+                profile = batch_service.build_candidate_profile(resume_data)
+
                 # Generate role recommendations using batch service
                 if target_role:
                     role_recommendations = await batch_service.analyze_role_fit(
-                        resume_data, target_role, job_description
+                        resume_data, target_role, job_description, profile=profile
                     )
                 else:
-                    role_recommendations = await batch_service.generate(resume_data)
-
-                advanced_analyzer = AdvancedAnalyzer()
-                resume_score = await advanced_analyzer.calculate_resume_score(resume_data)
-                personality_insights = await advanced_analyzer.analyze_personality(resume_data)
-                career_path = await advanced_analyzer.predict_career_path(resume_data)
-
-                response = ResumeAnalysisResponse(
-                    resumeData=ResumeData(**resume_data),
-                    questions=[], 
-                    roleRecommendations=role_recommendations,
-                    resumeScore=resume_score,
-                    personalityInsights=personality_insights,
-                    careerPath=career_path
-                )
-
-                results.append({
-                    "file_name": file.filename,
-                    "status": "success",
-                    "data": response,
-                    "error": None
-                })
-                successful_files.append(file.filename)
+                    role_recommendations = await batch_service.generate(resume_data, profile=profile)
 
-            except ValueError as e:
-                results.append({
-                    "file_name": file.filename,
-                    "status": "validation_error",
-                    "data": None,
-                    "error": str(e)
-                })
-                failed_files.append((file.filename, str(e)))
+                return resume_data, profile, role_recommendations
+            except Exception as e:
+                _record_failure(index, file, e)
+                return None
 
+        async def _analyze_one(index: int, file: UploadFile, prepared: tuple) -> None:
+            try:
+                analysis = await advanced_analyzer.analyze_all(prepared[0], profile=prepared[1])
+                _record_success(index, file, prepared, analysis)
             except Exception as e:
-                error_message = str(e)
-                print(f"DEBUG: Exception in batch_analyze for {file.filename}: {type(e).__name__}: {error_message}")
-                import traceback
-                traceback.print_exc()
-                
-                detailed_error = error_message
-                
-                if "PDF" in error_message:
-                    display_error = "Error reading PDF file. Please ensure it's not corrupted."
-                elif "DOCX" in error_message:
-                    display_error = "Error reading DOCX file. Please ensure it's a valid document."
-                else:
-                    display_error = detailed_error if "Failed to" in detailed_error else "Analysis failed. Please try again."
+                _record_failure(index, file, e)
+
+        async def _process_one(index: int, file: UploadFile) -> dict:
+            prepared = await _prepare_one(index, file)
+            if prepared is not None:
+                await _analyze_one(index, file, prepared)
+            return results[index]
+
+        async def _build_batch_response() -> dict:
+            ordered_results = [results[index] for index in range(len(files))]
+            successful_files = [r["file_name"] for r in ordered_results if r["status"] == "success"]
+            failed_files = [
+                {"filename": r["file_name"], "error": r["error"]}
+                for r in ordered_results if r["status"] != "success"
+            ]
 
-                results.append({
-                    "file_name": file.filename,
-                    "status": "error",
-                    "data": None,
-                    "error": display_error
-                })
-                failed_files.append((file.filename, display_error))
+            # ========== STEP 4: TRACK UPLOADS ==========
+            successful_count = len(successful_files)
 
-        # ========== STEP 4: TRACK UPLOADS ==========
-        successful_count = len(successful_files)
+            if successful_count > 0:
+                await rate_limit_service.increment_batch_counter(user_email, successful_count)
 
-        if successful_count > 0:
-            await rate_limit_service.increment_batch_counter(user_email, successful_count)
+            # ========== STEP 5: GET UPDATED STATS ==========
+            updated_usage = await rate_limit_service.get_feature_usage(user_email)
+            if updated_usage is None:
+                updated_usage = {
+                    "files_uploaded": 0,
+                    "batch_analysis": 0,
+                    "compare_resumes": 0
+                }
 
-        # ========== STEP 5: GET UPDATED STATS ==========
-        updated_usage = await rate_limit_service.get_feature_usage(user_email)
-        if updated_usage is None:
-            updated_usage = {
-                "files_uploaded": 0,
-                "batch_analysis": 0,
-                "compare_resumes": 0
+            warning_at_batches = 10  # Warning threshold for batch operations
+            approaching_limit = updated_usage["batch_analysis"] >= warning_at_batches
+
+            # ========== STEP 6: BUILD RESPONSE ==========
+            batch_response = {
+                "success": True,
+                "message": f"Batch analysis completed. {successful_count} of {len(files)} files processed successfully.",
+                "batch_summary": {
+                    "total_submitted": len(files),
+                    "successful": successful_count,
+                    "failed": len(failed_files),
+                    "success_rate": f"{(successful_count / len(files) * 100):.1f}%" if len(files) > 0 else "0%"
+                },
+                "usage_stats": {
+                    "batches_processed": updated_usage["batch_analysis"],
+                    "approaching_limit": approaching_limit,
+                    "approaching_limit_threshold": warning_at_batches
+                },
+                "results": ordered_results
             }
 
-        warning_at_batches = 10  # Warning threshold for batch operations
-        approaching_limit = updated_usage["batch_analysis"] >= warning_at_batches
-
-        # ========== STEP 6: BUILD RESPONSE ==========
-        batch_response = {
-            "success": True,
-            "message": f"Batch analysis completed. {successful_count} of {len(files)} files processed successfully.",
-            "batch_summary": {
-                "total_submitted": len(files),
-                "successful": successful_count,
-                "failed": len(failed_files),
-                "success_rate": f"{(successful_count / len(files) * 100):.1f}%" if len(files) > 0 else "0%"
-            },
-            "usage_stats": {
-                "batches_processed": updated_usage["batch_analysis"],
-                "approaching_limit": approaching_limit,
-                "approaching_limit_threshold": warning_at_batches
-            },
-            "results": results
-        }
+            if partial_upload and files_rejected > 0:
+                batch_response["upload_limit_info"] = {
+                    "reached_limit": True,
+                    "files_rejected": files_rejected,
+                    "message": f"{files_rejected} file(s) were not processed because they would exceed your free limit of 10 files.",
+                    "upgrade_prompt": {
+                        "show": True,
+                        "message": f"You've reached your free file limit. {files_rejected} file(s) could not be processed.",
+                        "cta": "Upgrade now to analyze all your resumes",
+                        "upgrade_required": True
+                    }
+                }
 
-        if partial_upload and files_rejected > 0:
-            batch_response["upload_limit_info"] = {
-                "reached_limit": True,
-                "files_rejected": files_rejected,
-                "message": f"{files_rejected} file(s) were not processed because they would exceed your free limit of 10 files.",
-                "upgrade_prompt": {
+            if approaching_limit:
+                batch_response["upgrade_prompt"] = {
                     "show": True,
-                    "message": f"You've reached your free file limit. {files_rejected} file(s) could not be processed.",
-                    "cta": "Upgrade now to analyze all your resumes",
-                    "upgrade_required": True
+                    "message": f"You've processed {updated_usage['batch_analysis']} batch operations.",
+                    "cta": "Upgrade now to process unlimited batches",
+                    "batches_processed": updated_usage['batch_analysis']
                 }
-            }
 
-        if approaching_limit:
-            batch_response["upgrade_prompt"] = {
-                "show": True,
-                "message": f"You've processed {updated_usage['batch_analysis']} batch operations.",
-                "cta": "Upgrade now to process unlimited batches",
-                "batches_processed": updated_usage['batch_analysis']
-            }
-
-        if failed_files:
-            batch_response["failed_files_details"] = [
-                {"filename": fname, "error": error}
-                for fname, error in failed_files
-            ]
+            if failed_files:
+                batch_response["failed_files_details"] = failed_files
+
+            return batch_response
+
+        if "text/event-stream" in request.headers.get("accept", ""):
+            # Stream each file's result as soon as it finishes, then the summary.
+            # The body runs after this handler returns, when the uploads are closed
+            # and the concurrency dependency has exited, so buffer the files and
+            # hand the slot and reservation over to the stream.
+            files = [await _buffered_upload(file) for file in files]
+            stream_reserved_files, reserved_files = reserved_files, 0  # released by the stream
+            slot_id = take_concurrency_slot(request)
+            released = False
+
+            async def _release_stream_holds() -> None:
+                # Runs from the stream's finally and again as the response's
+                # background task, which still runs if the client disconnects
+                # before the body starts; only the first call releases
+                nonlocal released
+                if released:
+                    return
+                released = True
+                if stream_reserved_files > 0:
+                    rate_limit_service.release_reservation("batch_analysis", user_email, stream_reserved_files)
+                if slot_id is not None:
+                    await rate_limit_service.release_concurrency_slot(user_email, slot_id)
+
+            async def _event_stream():
+                try:
+                    for finished in asyncio.as_completed(
+                        [_process_one(index, file) for index, file in enumerate(files)]
+                    ):
+                        yield _sse_event(await finished)
+                    batch_response = await _build_batch_response()
+                    batch_response.pop("results")
+                    yield _sse_event(batch_response, event="summary")
+                except Exception:
+                    logger.exception("Batch analysis stream failed")
+                    error = _error_detail("Batch analysis failed. Please try again.", error="SERVER_ERROR")
+                    yield _sse_event(error, event="error")
+                finally:
+                    await _release_stream_holds()
+
+            return StreamingResponse(
+                _event_stream(),
+                media_type="text/event-stream",
+                background=BackgroundTask(_release_stream_holds)
+            )
 
-        return batch_response
+        # Files are independent, so overlap their parsing and recommendation calls
+        prepared = await asyncio.gather(
+            *(_prepare_one(index, file) for index, file in enumerate(files))
+        )
+        ready = {index: item for index, item in enumerate(prepared) if item is not None}
+        if ready:
+            # Score every parsed resume in one combined model call per chunk
+            try:
+                analyses = await advanced_analyzer.analyze_batch(
+                    [item[0] for item in ready.values()],
+                    [item[1] for item in ready.values()]
+                )
+                for (index, item), analysis in zip(ready.items(), analyses):
+                    _record_success(index, files[index], item, analysis)
+            except Exception:
+                # Fall back to one call per resume so a bad reply only fails its own file
+                await asyncio.gather(
+                    *(_analyze_one(index, files[index], item) for index, item in ready.items())
+                )
+        return await _build_batch_response()
 
     except HTTPException:
         raise
@@ -524,12 +870,15 @@ async def batch_analyze_resumes(
                 "error": "SERVER_ERROR"
             }
         )
+    finally:
+        if reserved_files > 0:
+            rate_limit_service.release_reservation("batch_analysis", current_user.email, reserved_files)
 
 
 @router.post("/compare-resumes")
 async def compare_resumes(
     files: List[UploadFile] = File(...),
-    current_user: TokenData = Depends(get_current_user)
+    current_user: TokenData = Depends(limit_concurrent_requests)
 ):
     """
     Compare multiple resumes and rank them.
@@ -608,71 +957,76 @@ async def compare_resumes(
                 )
 
         # ========== STEP 3: PROCESS & ANALYZE RESUMES ==========
-        candidates = []
-        failed_files = []
-        compare_service = CompareResumesService()
-
-        for file in files:
+        score_total = 0.0
+        highest_score = 0.0
+        compare_service = _shared(CompareResumesService)
+        parser = _shared(ResumeParser)
+        advanced_analyzer = _shared(AdvancedAnalyzer)
+
+        async def _process_one(file: UploadFile) -> dict:
+            nonlocal score_total, highest_score
             try:
                 # Validate file
                 if not file.filename:
                     raise ValueError("No filename provided")
 
-                if not file.filename.lower().endswith(('.pdf', '.doc', '.docx')):
+                if not _valid_ext(file.filename):
                     raise ValueError("Invalid file format. Please upload PDF, DOC, or DOCX files only.")
 
                 # Check file size (max 10MB)
-                file_content = await file.read()
-                if len(file_content) > 10 * 1024 * 1024:
+                if not await _within_size_limit(file):
                     raise ValueError("File too large. Maximum size is 10MB.")
 
-                # Reset file pointer for processing
-                await file.seek(0)
-
                 # Parse resume
-                parser = ResumeParser()
                 resume_data = await parser.parse(file)
 
                 # Calculate score using compare service
-                advanced_analyzer = AdvancedAnalyzer()
                 score = await advanced_analyzer.calculate_resume_score(resume_data)
 
-                candidates.append({
+                candidate = {
                     "filename": file.filename,
                     "resumeData": ResumeData(**resume_data),
                     "score": score.overall_score,
                     "strengths": score.strengths,
                     "weaknesses": score.weaknesses,
                     "status": "success"
-                })
+                }
+
+                # Only count scores of resumes that made it into the results
+                score_total += score.overall_score
+                if score.overall_score > highest_score:
+                    highest_score = score.overall_score
+                return candidate
 
             except ValueError as e:
-                failed_files.append((file.filename, str(e)))
-                candidates.append({
+                return {
                     "filename": file.filename,
                     "error": str(e),
                     "score": 0,
                     "status": "validation_error"
-                })
+                }
 
             except Exception as e:
-                error_message = str(e)
-                if "PDF" in error_message:
-                    error_message = "Error reading PDF file. Please ensure it's not corrupted."
-                elif "DOCX" in error_message:
-                    error_message = "Error reading DOCX file. Please ensure it's a valid document."
-                else:
-                    error_message = "Analysis failed. Please try again."
+                error_message = _humanize_error(e)
 
-                failed_files.append((file.filename, error_message))
-                candidates.append({
+                return {
                     "filename": file.filename,
                     "error": error_message,
                     "score": 0,
                     "status": "error"
-                })
+                }
+
+        # _process_one turns every failure into an entry, so anything escaping
+        # (e.g. cancellation) should abort the request rather than leave a gap
+        candidates = await asyncio.gather(*(_process_one(file) for file in files))
+        successful_candidates = []
+        failed_files = []
+        for c in candidates:
+            if c["status"] == "success":
+                successful_candidates.append(c)
+            else:
+                failed_files.append({"filename": c["filename"], "error": c["error"]})
 
-        successful_candidates = [c for c in candidates if c["status"] == "success"]
         if len(successful_candidates) < 2:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -680,7 +1034,7 @@ async def compare_resumes(
                     "success": False,
                     "message": "Failed to analyze enough resumes. Need at least 2 valid resumes for comparison.",
                     "error": "INSUFFICIENT_VALID_FILES",
-                    "failed_files": [{"filename": fname, "error": error} for fname, error in failed_files]
+                    "failed_files": failed_files
                 }
             )
 
@@ -703,21 +1057,17 @@ async def compare_resumes(
         approaching_limit = updated_usage["compare_resumes"] >= warning_at_comparisons
 
         # ========== STEP 6: RANK & RETURN RESULTS ==========
-        ranked_candidates = sorted(
-            [c for c in candidates if c["status"] == "success"],
-            key=lambda x: x.get("score", 0),
-            reverse=True
-        )
+        ranked_candidates = sorted(successful_candidates, key=lambda x: x.get("score", 0), reverse=True)
 
         comparison_response = {
             "success": True,
-            "message": f"Comparison completed. {len(successful_candidates)} resumes analyzed successfully.",
+            "message": f"Comparison completed. {successful_count} resumes analyzed successfully.",
             "comparison_summary": {
                 "total_submitted": len(files),
-                "successful": len(successful_candidates),
+                "successful": successful_count,
                 "failed": len(failed_files),
-                "highest_score": max([c.get("score", 0) for c in successful_candidates]) if successful_candidates else 0,
-                "average_score": sum([c.get("score", 0) for c in successful_candidates]) / len(successful_candidates) if successful_candidates else 0
+                "highest_score": highest_score,
+                "average_score": score_total / successful_count
             },
             "usage_stats": {
                 "comparisons_completed": updated_usage["compare_resumes"],
@@ -741,10 +1091,7 @@ async def compare_resumes(
             }
 
         if failed_files:
-            comparison_response["failed_files_details"] = [
-                {"filename": fname, "error": error}
-                for fname, error in failed_files
-            ]
+            comparison_response["failed_files_details"] = failed_files
 
         return comparison_response
 
@@ -894,7 +1241,7 @@ async def selection_candidate(
                     validation_errors.append(f"File {idx+1}: No filename")
                     continue
                 
-                if not file.filename.lower().endswith(('.pdf', '.doc', '.docx')):
+                if not _valid_ext(file.filename):
                     raise HTTPException(
                         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                         detail={
@@ -904,9 +1251,8 @@ async def selection_candidate(
                         }
                     )
                 
-                # Check file size before reading
-                file_content = await file.read()
-                if len(file_content) > 10 * 1024 * 1024:  # 10MB
+                # Check file size without buffering the whole upload
+                if not await _within_size_limit(file):
                     raise HTTPException(
                         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                         detail={
@@ -916,8 +1262,6 @@ async def selection_candidate(
                         }
                     )
                 
-                # CRITICAL: Reset file pointer to beginning for processing
-                await file.seek(0)
                 validated_files.append(file)
                 
             except HTTPException:
@@ -940,7 +1284,7 @@ async def selection_candidate(
             )
         
         # ========== STEP 5: EVALUATE CANDIDATES ==========
-        selector = CandidateSelector()
+        selector = _shared_candidate_selector()
         results = await selector.evaluate_candidates(validated_files, job_title, keywords_list)
         
         # Track actual processed files
@@ -1,7 +1,14 @@
-from typing import Dict, List, Any, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+import asyncio
+import functools
+import hashlib
 import os
-from app.models.schemas import ResumeScore, PersonalityInsights, CareerPathPrediction
-from app.services.prompts.base_prompt_service import BasePromptService
+import orjson
+from app.models.schemas import ResumeScore, PersonalityInsights, CareerPathPrediction, FullAnalysis
+from app.services.prompts.base_prompt_service import (
+    BasePromptService, combined_analysis_rubric, combined_analysis_schema, configure_genai, generate_content
+)
+from app.services.response_cache import ResponseCache
 
 try:
     import google.generativeai as genai
@@ -10,7 +17,27 @@ except ImportError:
     genai = None
     GENAI_AVAILABLE = False
 
+T = TypeVar("T")
+
+
+def _gemini_call(label: str) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Wrap any failure inside an analyzer call as ValueError("Failed to <label>: ...")"""
+    def decorator(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(fn)
+        async def wrapper(self: Any, *args: Any, **kwargs: Any) -> T:
+            try:
+                return await fn(self, *args, **kwargs)
+            except Exception as e:
+                raise ValueError(f"Failed to {label}: {str(e)}") from e
+        return wrapper
+    return decorator
+
+
 class AdvancedAnalyzer(BasePromptService):
+    ANALYSIS_KINDS = ("score", "personality", "career")
+    # Resumes per combined prompt; ~1k tokens each keeps a chunk well inside the context window
+    BATCH_SIZE = 5
+
     def __init__(self):
         super().__init__()
         self.api_key = os.getenv("GOOGLE_API_KEY")
@@ -20,67 +47,198 @@ class AdvancedAnalyzer(BasePromptService):
         if not GENAI_AVAILABLE or not genai:
             raise ImportError("google-generativeai package is not available")
 
-        genai.configure(api_key=self.api_key)
+        configure_genai(self.api_key)
+        # Build the model handle once up front; every analysis call reuses it
+        self._model = self.model
+        # Identical resumes reuse earlier analyses instead of calling the model again
+        self._cache = ResponseCache(ttl=3600, max_entries=1024)
 
     async def generate(self, resume_data: Dict[str, Any], **kwargs) -> Dict[str, Any]:
         """Generate comprehensive analysis including score, personality, and career path."""
+        score, personality, career_path = await self.analyze_all(resume_data)
         return {
-            "score": await self.calculate_resume_score(resume_data),
-            "personality": await self.analyze_personality(resume_data),
-            "career_path": await self.predict_career_path(resume_data)
+            "score": score,
+            "personality": personality,
+            "career_path": career_path
         }
 
-    async def calculate_resume_score(self, resume_data: Dict[str, Any]) -> ResumeScore:
-        """Calculate comprehensive resume score with detailed breakdown"""
+    @_gemini_call("analyze resume")
+    async def analyze_all(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, Any]] = None
+    ) -> Tuple[ResumeScore, PersonalityInsights, CareerPathPrediction]:
+        """Run score, personality and career path analysis in a single model call"""
+        digest = self._resume_digest(resume_data)
+        cached = self._cached_analysis(digest)
+        if cached is not None:
+            return cached
+
+        profile = profile or self.build_candidate_profile(resume_data)
+        model = self.model
+        prompt = self._create_combined_prompt(resume_data, profile)
+        response = await generate_content(model, prompt)
+
+        if not response or not response.text:
+            raise ValueError("Empty response from AI model")
+
+        analysis = FullAnalysis(**self.parse_json_response(response.text))
+        return self._store_analysis(digest, analysis)
+
+    async def analyze_batch(
+        self,
+        resumes: List[Dict[str, Any]],
+        profiles: Optional[List[Optional[Dict[str, Any]]]] = None,
+        batch_size: Optional[int] = None
+    ) -> List[Tuple[ResumeScore, PersonalityInsights, CareerPathPrediction]]:
+        """
+        Analyze several resumes with one model call per chunk of batch_size.
+        Results come back in input order.
+        Raises ValueError if any chunk's combined response cannot be matched up.
+        """
+        batch_size = batch_size or self.BATCH_SIZE
+        profiles = profiles or [None] * len(resumes)
+        results: List[Any] = [self._cached_analysis(self._resume_digest(resume_data)) for resume_data in resumes]
+        pending = [index for index, result in enumerate(results) if result is None]
+
+        chunks = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+        chunk_results = await asyncio.gather(*(
+            self._analyze_chunk([resumes[i] for i in chunk], [profiles[i] for i in chunk])
+            for chunk in chunks
+        ))
+        for chunk, analyses in zip(chunks, chunk_results):
+            for index, analysis in zip(chunk, analyses):
+                results[index] = analysis
+        return results
+
+    async def _analyze_chunk(
+        self, resumes: List[Dict[str, Any]], profiles: List[Optional[Dict[str, Any]]]
+    ) -> List[Tuple[ResumeScore, PersonalityInsights, CareerPathPrediction]]:
+        if len(resumes) == 1:
+            return [await self.analyze_all(resumes[0], profiles[0])]
+
+        built_profiles = [
+            profile or self.build_candidate_profile(resume_data)
+            for resume_data, profile in zip(resumes, profiles)
+        ]
         try:
             model = self.model
-            prompt = self._create_scoring_prompt(resume_data)
-            response = await model.generate_content_async(prompt)
-            
-            if not response or not response.text:
-                raise ValueError("Empty response from AI model")
+            prompt = self._create_batch_prompt(resumes, built_profiles)
+            response = await generate_content(model, prompt)
 
-            score_data = self._parse_score_response(response.text)
-            return ResumeScore(**score_data)
-        except Exception as e:
-            raise ValueError(f"Failed to calculate resume score: {str(e)}")
-
-    async def analyze_personality(self, resume_data: Dict[str, Any]) -> PersonalityInsights:
-        """Analyze personality traits from resume content"""
-        try:
-            model = self.model
-            prompt = self._create_personality_prompt(resume_data)
-            response = await model.generate_content_async(prompt)
-            
             if not response or not response.text:
                 raise ValueError("Empty response from AI model")
 
-            personality_data = self._parse_personality_response(response.text)
-            return PersonalityInsights(**personality_data)
+            # Match analyses to resumes by id; the model may not keep resume order
+            analyses = {
+                int(item["resume_id"]): FullAnalysis(**item)
+                for item in self.parse_json_response(response.text)["analyses"]
+            }
+            missing = [n for n in range(1, len(resumes) + 1) if n not in analyses]
+            if missing:
+                raise ValueError(f"no analysis for resumes {missing}")
         except Exception as e:
-            raise ValueError(f"Failed to analyze personality: {str(e)}")
-
-    async def predict_career_path(self, resume_data: Dict[str, Any]) -> CareerPathPrediction:
+            raise ValueError(f"Failed to analyze resume batch: {str(e)}") from e
+
+        return [
+            self._store_analysis(self._resume_digest(resume_data), analyses[number])
+            for number, resume_data in enumerate(resumes, start=1)
+        ]
+
+    def _cached_analysis(
+        self, digest: str
+    ) -> Optional[Tuple[ResumeScore, PersonalityInsights, CareerPathPrediction]]:
+        cached = [self._cache.get(self._cache_key(kind, digest)) for kind in self.ANALYSIS_KINDS]
+        if any(result is None for result in cached):
+            return None
+        return cached[0], cached[1], cached[2]
+
+    def _store_analysis(
+        self, digest: str, analysis: FullAnalysis
+    ) -> Tuple[ResumeScore, PersonalityInsights, CareerPathPrediction]:
+        results = (analysis.score, analysis.personality, analysis.career_path)
+        for kind, result in zip(self.ANALYSIS_KINDS, results):
+            self._cache.set(self._cache_key(kind, digest), result)
+        return results
+
+    @staticmethod
+    def _resume_digest(resume_data: Dict[str, Any]) -> str:
+        """Hash the resume once per call; every per-kind cache key derives from it"""
+        canonical = orjson.dumps(
+            resume_data, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        )
+        return hashlib.sha256(canonical).hexdigest()
+
+    @staticmethod
+    def _cache_key(kind: str, digest: str) -> str:
+        return f"{kind}:{digest}"
+
+    @_gemini_call("calculate resume score")
+    async def calculate_resume_score(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, Any]] = None
+    ) -> ResumeScore:
+        """Calculate comprehensive resume score with detailed breakdown"""
+        cache_key = self._cache_key("score", self._resume_digest(resume_data))
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        model = self.model
+        prompt = self._create_scoring_prompt(resume_data, profile)
+        response = await generate_content(model, prompt)
+
+        if not response or not response.text:
+            raise ValueError("Empty response from AI model")
+
+        score_data = self._parse_score_response(response.text)
+        result = ResumeScore(**score_data)
+        self._cache.set(cache_key, result)
+        return result
+
+    @_gemini_call("analyze personality")
+    async def analyze_personality(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, Any]] = None
+    ) -> PersonalityInsights:
+        """Analyze personality traits from resume content"""
+        cache_key = self._cache_key("personality", self._resume_digest(resume_data))
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        model = self.model
+        prompt = self._create_personality_prompt(resume_data, profile)
+        response = await generate_content(model, prompt)
+
+        if not response or not response.text:
+            raise ValueError("Empty response from AI model")
+
+        personality_data = self._parse_personality_response(response.text)
+        result = PersonalityInsights(**personality_data)
+        self._cache.set(cache_key, result)
+        return result
+
+    @_gemini_call("predict career path")
+    async def predict_career_path(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, Any]] = None
+    ) -> CareerPathPrediction:
         """Predict career progression and next steps"""
-        try:
-            model = self.model
-            prompt = self._create_career_prompt(resume_data)
-            response = await model.generate_content_async(prompt)
-            
-            if not response or not response.text:
-                raise ValueError("Empty response from AI model")
+        cache_key = self._cache_key("career", self._resume_digest(resume_data))
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-            career_data = self._parse_career_response(response.text)
-            return CareerPathPrediction(**career_data)
-        except Exception as e:
-            raise ValueError(f"Failed to predict career path: {str(e)}")
+        model = self.model
+        prompt = self._create_career_prompt(resume_data, profile)
+        response = await generate_content(model, prompt)
 
-    def _create_scoring_prompt(self, resume_data: Dict[str, Any]) -> str:
-        formatted_experience = self.format_work_experience(resume_data.get("workExperience", []))
-        formatted_education = self.format_education(resume_data.get("education", []))
-        formatted_skills = self.format_skills(resume_data.get("skills", []))
+        if not response or not response.text:
+            raise ValueError("Empty response from AI model")
 
-        return f"""
+        career_data = self._parse_career_response(response.text)
+        result = CareerPathPrediction(**career_data)
+        self._cache.set(cache_key, result)
+        return result
+
+    # Static prompt skeletons; only the candidate fields are filled in per call
+    _SCORING_TEMPLATE = """
 ROLE: Expert Resume Evaluator
 TASK: Score resume across 5 dimensions with concise assessment
 INSTRUCTIONS: Reasoning MUST be 1-2 sentences max. Strengths/weaknesses top 3 only. Be direct and concise.
@@ -113,13 +271,7 @@ RESPONSE_SCHEMA:
 OUTPUT: Return ONLY valid JSON. Concise only.
 """
 
-    def _create_personality_prompt(self, resume_data: Dict[str, Any]) -> str:
-        # Extract text content for personality analysis
-        formatted_experience = self.format_work_experience(resume_data.get("workExperience", []))
-        formatted_education = self.format_education(resume_data.get("education", []))
-        formatted_skills = self.format_skills(resume_data.get("skills", []))
-
-        return f"""
+    _PERSONALITY_TEMPLATE = """
 ROLE: Personality and Work Style Analyst
 TASK: Infer personality traits and work preferences from resume
 INSTRUCTIONS: Use resume indicators (achievements, roles, skills) to score traits. Analysis MUST be 2-3 sentences max.
@@ -159,15 +311,7 @@ RESPONSE_SCHEMA:
 OUTPUT: Return ONLY valid JSON. Be concise and direct.
 """
 
-    def _create_career_prompt(self, resume_data: Dict[str, Any]) -> str:
-        formatted_skills = self.format_skills(resume_data.get("skills", []))
-        experience = resume_data.get("workExperience", [])
-        education = resume_data.get("education", [])
-
-        current_role = experience[0].get("title", "Entry Level") if experience else "Entry Level"
-        years_exp = len(experience) * 2  # Rough estimate
-
-        return f"""
+    _CAREER_TEMPLATE = """
 ROLE: Career Development Expert
 TASK: Predict career progression and next opportunities
 INSTRUCTIONS: Identify current level, top 3 next roles, timeline, and key skill gaps. Be direct and actionable.
@@ -175,8 +319,8 @@ INSTRUCTIONS: Identify current level, top 3 next roles, timeline, and key skill
 CANDIDATE PROFILE:
 Skills: {formatted_skills}
 Current Role: {current_role}
-Years of Experience: Approximately {years_exp}
-Education: {self.format_education(education)}
+Years of Experience: {years_exp}
+Education: {formatted_education}
 
 ANALYSIS REQUIREMENTS:
 1. Current career level: "Entry Level", "Mid Level", "Senior Level", or "Executive"
@@ -193,6 +337,114 @@ RESPONSE_SCHEMA:
 }}
 
 OUTPUT: Return ONLY valid JSON. Be specific and actionable.
+"""
+
+    def _create_scoring_prompt(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, Any]] = None
+    ) -> str:
+        profile = profile or self.build_candidate_profile(resume_data)
+        formatted_experience = profile["experience"]
+        formatted_education = profile["education"]
+        formatted_skills = profile["skills"]
+
+        return self._SCORING_TEMPLATE.format(
+            formatted_skills=formatted_skills,
+            formatted_experience=formatted_experience,
+            formatted_education=formatted_education
+        )
+
+    def _create_personality_prompt(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, Any]] = None
+    ) -> str:
+        # Extract text content for personality analysis
+        profile = profile or self.build_candidate_profile(resume_data)
+        formatted_experience = profile["experience"]
+        formatted_education = profile["education"]
+        formatted_skills = profile["skills"]
+
+        return self._PERSONALITY_TEMPLATE.format(
+            formatted_experience=formatted_experience,
+            formatted_education=formatted_education,
+            formatted_skills=formatted_skills
+        )
+
+    def _create_career_prompt(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, Any]] = None
+    ) -> str:
+        profile = profile or self.build_candidate_profile(resume_data)
+        formatted_skills = profile["skills"]
+        formatted_education = profile["education"]
+        experience = resume_data.get("workExperience", [])
+
+        current_role = experience[0].get("title", "Entry Level") if experience else "Entry Level"
+        years_exp = self.format_years_experience(experience)
+
+        return self._CAREER_TEMPLATE.format(
+            formatted_skills=formatted_skills,
+            current_role=current_role,
+            years_exp=years_exp,
+            formatted_education=formatted_education
+        )
+
+    _COMBINED_RUBRIC = combined_analysis_rubric("score", "personality", "career_path")
+    _COMBINED_SCHEMA = combined_analysis_schema("score", "personality", "career_path")
+    _BATCH_ENTRY_SCHEMA = combined_analysis_schema(
+        "score", "personality", "career_path", leading_sections='\n  "resume_id": <resume number>,'
+    )
+
+    def _render_combined_candidate(self, resume_data: Dict[str, Any], profile: Dict[str, Any]) -> str:
+        experience = resume_data.get("workExperience", [])
+
+        current_role = experience[0].get("title", "Entry Level") if experience else "Entry Level"
+        years_exp = self.format_years_experience(experience)
+
+        return (
+            f"Skills: {profile['skills']}\n"
+            f"Experience: {profile['experience']}\n"
+            f"Education: {profile['education']}\n"
+            f"Current Role: {current_role}\n"
+            f"Years of Experience: {years_exp}"
+        )
+
+    def _create_combined_prompt(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, Any]] = None
+    ) -> str:
+        profile = profile or self.build_candidate_profile(resume_data)
+
+        return f"""
+ROLE: Expert Resume Evaluator, Work Style Analyst and Career Development Expert
+TASK: Score the resume, infer personality traits and predict career progression
+INSTRUCTIONS: Reasoning 1-2 sentences, analysis 2-3 sentences max. Score and career lists top 3 only. Be direct and concise.
+
+CANDIDATE PROFILE:
+{self._render_combined_candidate(resume_data, profile)}
+{self._COMBINED_RUBRIC}
+RESPONSE_SCHEMA:
+{self._COMBINED_SCHEMA}
+
+OUTPUT: Return ONLY valid JSON. Concise only.
+"""
+
+    def _create_batch_prompt(
+        self, resumes: List[Dict[str, Any]], profiles: List[Dict[str, Any]]
+    ) -> str:
+        candidates = "\n\n".join(
+            f"RESUME {number}:\n{self._render_combined_candidate(resume_data, profile)}"
+            for number, (resume_data, profile) in enumerate(zip(resumes, profiles), start=1)
+        )
+
+        return f"""
+ROLE: Expert Resume Evaluator, Work Style Analyst and Career Development Expert
+TASK: For each of the {len(resumes)} resumes, score it, infer personality traits and predict career progression
+INSTRUCTIONS: Evaluate every resume independently. Reasoning 1-2 sentences, analysis 2-3 sentences max. Score and career lists top 3 only.
+
+{candidates}
+{self._COMBINED_RUBRIC}
+RESPONSE_SCHEMA:
+{{"analyses": [<one object per resume, each shaped as below>]}}
+{self._BATCH_ENTRY_SCHEMA}
+
+OUTPUT: Return ONLY valid JSON with exactly {len(resumes)} entries in "analyses", one per resume number. Concise only.
 """
 
     def _parse_score_response(self, text: str) -> Dict[str, Any]:
@@ -1,13 +1,19 @@
-from typing import Dict, List, Any
+import asyncio
+from typing import Dict, List, Any, Optional
 from app.services.resume_parser import ResumeParser
 from app.services.prompts.candidate_selection_service import CandidateSelectionService
 from fastapi import UploadFile
 
 
 class CandidateSelector:
-    def __init__(self):
-        self.parser = ResumeParser()
-        self.selector_service = CandidateSelectionService()
+    def __init__(
+        self,
+        parser: Optional[ResumeParser] = None,
+        selector_service: Optional[CandidateSelectionService] = None,
+    ):
+        # Callers holding process-wide instances pass them in instead of building duplicates
+        self.parser = parser or ResumeParser()
+        self.selector_service = selector_service or CandidateSelectionService()
 
     async def evaluate_candidates(
         self, files: List[UploadFile], job_title: str, keywords: List[str]
@@ -21,49 +27,57 @@ class CandidateSelector:
         Returns:
             List of results with candidate name, status, and message
         """
-        results = []
-        
-        for idx, file in enumerate(files):
-            try:
-                # Reset file pointer to beginning - critical for multiple files
-                try:
-                    await file.seek(0)
-                except Exception as seek_err:
-                    print(f"Warning: Could not seek on file {idx} ({file.filename}): {seek_err}")
-                
-                # Extract text from resume
-                content = await self._extract_resume_text(file)
-                
-                if not content or not content.strip():
-                    results.append({
-                        "candidate": file.filename or f"File{idx+1}",
-                        "status": "REJECT",
-                        "message": "No readable content found in file"
-                    })
-                    continue
-                
-                # Evaluate candidate
-                evaluation = await self.selector_service.evaluate_candidate(
-                    content, job_title, keywords
-                )
-                
-                result = {
-                    "candidate": file.filename or f"File{idx+1}",
-                    "status": evaluation.get("status", "REJECT"),
-                    "message": evaluation.get("message", "Evaluation completed")
-                }
-                results.append(result)
-                
-            except Exception as e:
+        # Gemini concurrency is already capped inside generate_content
+        contents = await asyncio.gather(*(
+            self._read_candidate(idx, file) for idx, file in enumerate(files)
+        ), return_exceptions=True)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(files)
+        readable: List[int] = []
+        readable_contents: List[str] = []
+        for idx, (file, content) in enumerate(zip(files, contents)):
+            if isinstance(content, BaseException):
                 # If parsing fails, mark as reject with detailed error
-                print(f"Error processing file {idx} ({file.filename}): {str(e)}")
-                results.append({
-                    "candidate": file.filename or f"File{idx+1}",
-                    "status": "REJECT",
-                    "message": f"Could not parse file: {str(e)[:50]}"
-                })
+                print(f"Error processing file {idx} ({file.filename}): {str(content)}")
+                results[idx] = self._reject(idx, file, f"Could not parse file: {str(content)[:50]}")
+            elif not content.strip():
+                results[idx] = self._reject(idx, file, "No readable content found in file")
+            else:
+                readable.append(idx)
+                readable_contents.append(content)
+
+        # Evaluate the readable candidates together, one model call per batch;
+        # a chunk whose reply is unusable falls back to single evaluations on its own
+        evaluations = await self.selector_service.evaluate_candidates_batch(
+            readable_contents, job_title, keywords
+        )
+
+        for idx, evaluation in zip(readable, evaluations):
+            results[idx] = {
+                "candidate": files[idx].filename or f"File{idx+1}",
+                "status": evaluation.get("status", "REJECT"),
+                "message": evaluation.get("message", "Evaluation completed")
+            }
+        # Every slot is filled above
+        return [result for result in results if result is not None]
+
+    async def _read_candidate(self, idx: int, file: UploadFile) -> str:
+        # Reset file pointer to beginning - critical for multiple files
+        try:
+            await file.seek(0)
+        except Exception as seek_err:
+            print(f"Warning: Could not seek on file {idx} ({file.filename}): {seek_err}")
         
-        return results
+        # Extract text from resume
+        return await self._extract_resume_text(file)
+
+    @staticmethod
+    def _reject(idx: int, file: UploadFile, message: str) -> Dict[str, Any]:
+        return {
+            "candidate": file.filename or f"File{idx+1}",
+            "status": "REJECT",
+            "message": message
+        }
 
     async def _extract_resume_text(self, file: UploadFile) -> str:
         """
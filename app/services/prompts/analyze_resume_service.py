@@ -1,7 +1,13 @@
+import asyncio
 import os
 from typing import Dict, List, Any, Optional
-from app.models.schemas import RoleRecommendation, ResumeScore, PersonalityInsights, CareerPathPrediction
-from app.services.prompts.base_prompt_service import BasePromptService
+from app.models.schemas import (
+    RoleRecommendation, ResumeScore, PersonalityInsights, CareerPathPrediction, ResumeAnalysisSections
+)
+from app.services.prompts.base_prompt_service import (
+    BasePromptService, combined_analysis_rubric, combined_analysis_schema, configure_genai,
+    fit_to_token_budget, generate_content, json_model
+)
 
 try:
     import google.generativeai as genai
@@ -28,7 +34,7 @@ class AnalyzeResumeService(BasePromptService):
             raise ValueError("GOOGLE_API_KEY environment variable is required")
         if not GENAI_AVAILABLE or not genai:
             raise ImportError("google-generativeai package is not available")
-        genai.configure(api_key=self.api_key)
+        configure_genai(self.api_key)
         self._model = None
 
     @property
@@ -37,17 +43,7 @@ class AnalyzeResumeService(BasePromptService):
         if self._model is None:
             if not GENAI_AVAILABLE or not genai:
                 raise ImportError("google-generativeai package is not available")
-            try:
-                json_config = genai.types.GenerationConfig(
-                    response_mime_type="application/json"
-                )
-                self._model = genai.GenerativeModel(
-                    self.DEFAULT_MODEL,
-                    generation_config=json_config
-                )
-            except Exception:
-                # Fallback for older API versions (A fallback response is a default, pre-defined reply or action that a system takes when it doesn't understand a user's input, encounters an error, or cannot find a specific answer.)
-                self._model = genai.GenerativeModel(self.DEFAULT_MODEL)
+            self._model = json_model(self.DEFAULT_MODEL)
         return self._model
 
     async def generate(self, resume_data: Dict[str, Any], **kwargs) -> List[RoleRecommendation]:
@@ -55,13 +51,13 @@ class AnalyzeResumeService(BasePromptService):
         Generate general role recommendations based on resume data.
         Args:
             resume_data: Parsed resume data dictionary
-            **kwargs: Additional arguments (not used in this method)
+            **kwargs: profile - optional pre-built candidate profile to reuse
         Returns:
             List of RoleRecommendation objects
         """
         model = self.model
-        prompt = self._create_role_prompt(resume_data)
-        response = await model.generate_content_async(prompt)
+        prompt = self._create_role_prompt(resume_data, kwargs.get("profile"))
+        response = await generate_content(model, prompt)
         
         try:
             role_recommendations = self._parse_recommendations(response.text)
@@ -81,7 +77,8 @@ class AnalyzeResumeService(BasePromptService):
         self,
         resume_data: Dict[str, Any],
         target_role: str,
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, str]] = None
     ) -> List[RoleRecommendation]:
         """
         Analyze if candidate fits the target role and provide alternatives.
@@ -89,12 +86,13 @@ class AnalyzeResumeService(BasePromptService):
             resume_data: Parsed resume data dictionary
             target_role: Target job role to analyze fit for
             job_description: Optional job description for better analysis
+            profile: Optional pre-built candidate profile to reuse
         Returns:
             List of RoleRecommendation objects with target role as primary
         """
         model = self.model
-        prompt = self._create_role_fit_prompt(resume_data, target_role, job_description)
-        response = await model.generate_content_async(prompt)
+        prompt = self._create_role_fit_prompt(resume_data, target_role, job_description, profile)
+        response = await generate_content(model, prompt)
         
         try:
             role_recommendations = self._parse_recommendations(response.text)
@@ -110,17 +108,20 @@ class AnalyzeResumeService(BasePromptService):
         except Exception as e:
             raise ValueError(f"Failed to analyze role fit: {str(e)}")
 
-    async def calculate_resume_score(self, resume_data: Dict[str, Any]) -> ResumeScore:
+    async def calculate_resume_score(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, str]] = None
+    ) -> ResumeScore:
         """
         Calculate comprehensive resume score across multiple dimensions.
         Args:
             resume_data: Parsed resume data dictionary
+            profile: Optional pre-built candidate profile to reuse
         Returns:
             ResumeScore object with detailed breakdown
         """
         model = self.model
-        prompt = self._create_scoring_prompt(resume_data)
-        response = await model.generate_content_async(prompt)
+        prompt = self._create_scoring_prompt(resume_data, profile)
+        response = await generate_content(model, prompt)
         
         try:
             score_data = self._parse_score_response(response.text)
@@ -128,17 +129,20 @@ class AnalyzeResumeService(BasePromptService):
         except Exception as e:
             raise ValueError(f"Failed to calculate resume score: {str(e)}")
 
-    async def analyze_personality(self, resume_data: Dict[str, Any]) -> PersonalityInsights:
+    async def analyze_personality(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, str]] = None
+    ) -> PersonalityInsights:
         """
         Analyze personality traits and work style preferences from resume.
         Args:
             resume_data: Parsed resume data dictionary
+            profile: Optional pre-built candidate profile to reuse
         Returns:
             PersonalityInsights object with trait analysis
         """
         model = self.model
-        prompt = self._create_personality_prompt(resume_data)
-        response = await model.generate_content_async(prompt)
+        prompt = self._create_personality_prompt(resume_data, profile)
+        response = await generate_content(model, prompt)
         
         try:
             personality_data = self._parse_personality_response(response.text)
@@ -146,17 +150,20 @@ class AnalyzeResumeService(BasePromptService):
         except Exception as e:
             raise ValueError(f"Failed to analyze personality: {str(e)}")
 
-    async def predict_career_path(self, resume_data: Dict[str, Any]) -> CareerPathPrediction:
+    async def predict_career_path(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, str]] = None
+    ) -> CareerPathPrediction:
         """
         Predict career progression and next opportunities.
         Args:
             resume_data: Parsed resume data dictionary
+            profile: Optional pre-built candidate profile to reuse
         Returns:
             CareerPathPrediction object with progression analysis
         """
         model = self.model
-        prompt = self._create_career_prompt(resume_data)
-        response = await model.generate_content_async(prompt)
+        prompt = self._create_career_prompt(resume_data, profile)
+        response = await generate_content(model, prompt)
         
         try:
             career_data = self._parse_career_response(response.text)
@@ -168,7 +175,8 @@ class AnalyzeResumeService(BasePromptService):
         self,
         resume_data: Dict[str, Any],
         target_role: str,
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, str]] = None
     ) -> Dict[str, Any]:
         """
         Generate a comprehensive preparation plan for a specific target role.
@@ -177,6 +185,7 @@ class AnalyzeResumeService(BasePromptService):
             resume_data: Parsed resume data dictionary
             target_role: Target job role to prepare for
             job_description: Optional job description for detailed analysis
+            profile: Optional pre-built candidate profile to reuse
         Returns:
             Dictionary with role-specific preparation plan including:
             - Role fit score
@@ -187,8 +196,8 @@ class AnalyzeResumeService(BasePromptService):
             - Success metrics
         """
         model = self.model
-        prompt = self._create_preparation_plan_prompt(resume_data, target_role, job_description)
-        response = await model.generate_content_async(prompt)
+        prompt = self._create_preparation_plan_prompt(resume_data, target_role, job_description, profile)
+        response = await generate_content(model, prompt)
         
         try:
             preparation_plan = self._parse_preparation_plan_response(response.text)
@@ -196,6 +205,65 @@ class AnalyzeResumeService(BasePromptService):
         except Exception as e:
             raise ValueError(f"Failed to generate preparation plan: {str(e)}")
 
+    async def analyze_all(
+        self,
+        resume_data: Dict[str, Any],
+        target_role: Optional[str] = None,
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, str]] = None
+    ) -> ResumeAnalysisSections:
+        """
+        Produce role recommendations, resume score, personality insights and
+        career path in a single model call.
+        Args:
+            resume_data: Parsed resume data dictionary
+            target_role: Optional target role; recommendations then analyze fit for it
+            job_description: Optional job description for the target role
+            profile: Optional pre-built candidate profile to reuse
+        Returns:
+            ResumeAnalysisSections with one validated model per section
+        """
+        model = self.model
+        prompt = self._create_combined_prompt(resume_data, target_role, job_description, profile)
+        response = await generate_content(model, prompt)
+        
+        try:
+            return ResumeAnalysisSections(**self.parse_json_response(response.text))
+        except Exception as e:
+            raise ValueError(f"Failed to analyze resume: {str(e)}")
+
+    async def analyze_all_parallel(
+        self,
+        resume_data: Dict[str, Any],
+        target_role: Optional[str] = None,
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, str]] = None
+    ) -> ResumeAnalysisSections:
+        """
+        Same sections as analyze_all, from the four single-section prompts run concurrently.
+        Used when the combined response cannot be parsed or validated.
+        Concurrency against Gemini is bounded process-wide by generate_content.
+        """
+        profile = profile or self._build_candidate_profile(resume_data)
+        if target_role:
+            recommendations_call = self.analyze_role_fit(resume_data, target_role, job_description, profile)
+        else:
+            recommendations_call = self.generate(resume_data, profile=profile)
+
+        role_recommendations, resume_score, personality_insights, career_path = await asyncio.gather(
+            recommendations_call,
+            self.calculate_resume_score(resume_data, profile),
+            self.analyze_personality(resume_data, profile),
+            self.predict_career_path(resume_data, profile)
+        )
+        # Each section was validated by its own method
+        return ResumeAnalysisSections.model_construct(
+            roleRecommendations=role_recommendations,
+            resumeScore=resume_score,
+            personalityInsights=personality_insights,
+            careerPath=career_path
+        )
+
     # ========== PROMPT CREATION METHODS ==========
     def _build_candidate_profile(self, resume_data: Dict[str, Any]) -> Dict[str, str]:
         """
@@ -215,13 +283,15 @@ class AnalyzeResumeService(BasePromptService):
             "personal_info": self.extract_personal_info(resume_data)
         }
 
-    def _create_role_prompt(self, resume_data: Dict[str, Any]) -> str:
+    def _create_role_prompt(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, str]] = None
+    ) -> str:
         """
         Create a focused prompt for general role recommendation.
         Uses structured ROLE/TASK/INSTRUCTIONS format.
         JSON mode ensures valid JSON output without extra tokens.
         """
-        profile = self._build_candidate_profile(resume_data)
+        profile = profile or self._build_candidate_profile(resume_data)
 
         return f"""
 ROLE: Expert Career Advisor and Recruitment Specialist
@@ -259,16 +329,20 @@ OUTPUT: Return ONLY the JSON array with exactly 5 role recommendations, sorted b
         self,
         resume_data: Dict[str, Any],
         target_role: str,
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, str]] = None
     ) -> str:
         """
         Create a focused prompt for analyzing target role fit.
         Uses structured ROLE/TASK/INSTRUCTIONS format.
         JSON mode ensures valid JSON output without extra tokens.
         """
-        profile = self._build_candidate_profile(resume_data)
+        profile = profile or self._build_candidate_profile(resume_data)
         
-        job_desc_section = f"\n\nJOB DESCRIPTION:\n{job_description}" if job_description else ""
+        job_desc_section = (
+            f"\n\nJOB DESCRIPTION:\n{fit_to_token_budget(job_description, self.JOB_DESCRIPTION_TOKEN_BUDGET)}"
+            if job_description else ""
+        )
 
         return f"""
 ROLE: Senior Recruiter and Career Analyst
@@ -311,12 +385,14 @@ RESPONSE_SCHEMA:
 OUTPUT: Return ONLY the JSON array. Target role first, followed by 2-3 alternative roles sorted by matchPercentage descending.
 """
 
-    def _create_scoring_prompt(self, resume_data: Dict[str, Any]) -> str:
+    def _create_scoring_prompt(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, str]] = None
+    ) -> str:
         """
         Create a concise prompt for resume scoring across dimensions.
         Uses structured ROLE/TASK/INSTRUCTIONS format.
         """
-        profile = self._build_candidate_profile(resume_data)
+        profile = profile or self._build_candidate_profile(resume_data)
 
         return f"""
 ROLE: Expert Resume Evaluator
@@ -351,12 +427,14 @@ RESPONSE_SCHEMA:
 OUTPUT: Return ONLY valid JSON. Concise only.
 """
 
-    def _create_personality_prompt(self, resume_data: Dict[str, Any]) -> str:
+    def _create_personality_prompt(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, str]] = None
+    ) -> str:
         """
         Create a concise prompt for personality analysis from resume indicators.
         Uses structured ROLE/TASK/INSTRUCTIONS format.
         """
-        profile = self._build_candidate_profile(resume_data)
+        profile = profile or self._build_candidate_profile(resume_data)
 
         return f"""
 ROLE: Personality and Work Style Analyst
@@ -398,14 +476,16 @@ RESPONSE_SCHEMA:
 OUTPUT: Return ONLY valid JSON. Be concise and direct.
 """
 
-    def _create_career_prompt(self, resume_data: Dict[str, Any]) -> str:
+    def _create_career_prompt(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, str]] = None
+    ) -> str:
         """
         Create a concise prompt for career path prediction.
         Uses structured ROLE/TASK/INSTRUCTIONS format.
         """
-        profile = self._build_candidate_profile(resume_data)
+        profile = profile or self._build_candidate_profile(resume_data)
         experience = resume_data.get("workExperience", [])
-        years_exp = len(experience) * 2  # Rough estimate
+        years_exp = self.format_years_experience(experience)
 
         return f"""
 ROLE: Career Development Expert
@@ -415,7 +495,7 @@ INSTRUCTIONS: Identify current level, top 3 next roles, timeline, and key skill
 CANDIDATE PROFILE:
 Skills: {profile['skills']}
 Current Role: {experience[0].get('title', 'Entry Level') if experience else 'Entry Level'}
-Years of Experience: Approximately {years_exp}
+Years of Experience: {years_exp}
 Education: {profile['education']}
 
 ANALYSIS REQUIREMENTS:
@@ -439,16 +519,20 @@ OUTPUT: Return ONLY valid JSON. Be specific and actionable.
         self,
         resume_data: Dict[str, Any],
         target_role: str,
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, str]] = None
     ) -> str:
         """
         Create a comprehensive prompt for generating role-specific preparation plan.
         Combines resume analysis, job requirements, and skill gap analysis.
         """
-        profile = self._build_candidate_profile(resume_data)
+        profile = profile or self._build_candidate_profile(resume_data)
         experience = resume_data.get("workExperience", [])
         
-        job_desc_section = f"\n\nJOB DESCRIPTION:\n{job_description}" if job_description else ""
+        job_desc_section = (
+            f"\n\nJOB DESCRIPTION:\n{fit_to_token_budget(job_description, self.JOB_DESCRIPTION_TOKEN_BUDGET)}"
+            if job_description else ""
+        )
         current_role = experience[0].get('title', 'Entry Level') if experience else 'Entry Level'
 
         return f"""
@@ -532,6 +616,82 @@ RESPONSE_SCHEMA:
 }}
 
 OUTPUT: Return ONLY valid JSON. Be specific, actionable, and encouraging while realistic about requirements.
+"""
+
+    # Condensed rubrics for the combined prompt; the single-section prompts above carry the full text
+    _COMBINED_RUBRIC = combined_analysis_rubric("resumeScore", "personalityInsights", "careerPath")
+    _COMBINED_SCHEMA = combined_analysis_schema(
+        "resumeScore", "personalityInsights", "careerPath",
+        leading_sections="""
+  "roleRecommendations": [
+    {
+      "roleName": "<job title>",
+      "matchPercentage": <0-100>,
+      "reasoning": "<1-2 sentences: why this role fits>",
+      "requiredSkills": ["<skill 1>", "<skill 2>"],
+      "missingSkills": ["<gap 1>", "<gap 2>"]
+    }
+  ],"""
+    )
+
+    def _create_combined_prompt(
+        self,
+        resume_data: Dict[str, Any],
+        target_role: Optional[str] = None,
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, str]] = None
+    ) -> str:
+        """
+        Create one prompt covering the role, score, personality and career sections.
+        Role recommendations follow the role-fit rules when a target role is given.
+        """
+        profile = profile or self._build_candidate_profile(resume_data)
+        experience = resume_data.get("workExperience", [])
+        current_role = experience[0].get('title', 'Entry Level') if experience else 'Entry Level'
+
+        if target_role:
+            job_desc_section = (
+                f"\n\nJOB DESCRIPTION:\n{fit_to_token_budget(job_description, self.JOB_DESCRIPTION_TOKEN_BUDGET)}"
+                if job_description else ""
+            )
+            role_section = f"""
+TARGET ROLE: {target_role}{job_desc_section}
+
+RECOMMENDATION RUBRIC (roleRecommendations):
+- 90-100: Excellent fit, ready to start
+- 75-89: Strong fit, minimal onboarding needed
+- 60-74: Good fit, some training required
+- <60: Potential role, significant development needed
+- "{target_role}" first, followed by 2-3 alternative roles sorted by matchPercentage descending
+"""
+        else:
+            role_section = """
+RECOMMENDATION RUBRIC (roleRecommendations):
+- 90-100: Excellent fit, minimal skill gaps
+- 75-89: Strong fit, some valuable experience
+- 60-74: Good fit, notable skill gaps
+- <60: Potential role, significant development needed
+- Exactly 5 roles, sorted by matchPercentage descending
+"""
+
+        return f"""
+ROLE: Career Advisor, Resume Evaluator, Work Style Analyst and Career Development Expert
+TASK: Recommend suitable roles, score the resume, infer personality traits and predict career progression
+INSTRUCTIONS: Complete every section independently. Reasoning 1-2 sentences, analysis 2-3 sentences max. Score and career lists top 3 only; role count as the recommendation rubric says.
+
+CANDIDATE PROFILE:
+Name: {profile['personal_info']['name']}
+Current Role: {current_role}
+Years of Experience: {self.format_years_experience(experience)}
+Skills: {profile['skills']}
+Experience: {profile['experience']}
+Education: {profile['education']}
+Highlights: {profile['highlights']}
+{role_section}{self._COMBINED_RUBRIC}
+RESPONSE_SCHEMA:
+{self._COMBINED_SCHEMA}
+
+OUTPUT: Return ONLY valid JSON with exactly these four keys. Concise only.
 """
 
     # ========== RESPONSE PARSING METHODS ==========
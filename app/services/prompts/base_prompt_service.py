@@ -1,7 +1,236 @@
-import json
-from typing import Dict, List, Any
+import asyncio
+import os
+import random
+import re
+import time
+from datetime import date
+import weakref
+import orjson
+from functools import lru_cache
+from typing import Dict, List, Any, Optional
 from abc import ABC, abstractmethod
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+# Upper bound on Gemini requests in flight per process, shared by every service
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "10"))
+GEMINI_MAX_ATTEMPTS = 3
+_gemini_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+# Dates inside work-experience durations: "Jan 2020", "03/2019", "2018", "Present"
+_DURATION_POINT_RE = re.compile(
+    r"(?:\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?"
+    r"|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b\.?\s*|\b(\d{1,2})/)?\b((?:19|20)\d{2})\b"
+    r"|\b(present|current|now|today)\b",
+    re.IGNORECASE
+)
+_MONTHS = {name: number for number, name in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1
+)}
+
+# Quota and availability errors that usually clear up on their own
+_TRANSIENT_GEMINI_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+# Connection drops and timeouts on the way to Gemini; also worth another try
+_TRANSIENT_NETWORK_ERRORS = (ConnectionError, TimeoutError, asyncio.TimeoutError)
+_TRANSIENT_ERRORS = _TRANSIENT_GEMINI_ERRORS + _TRANSIENT_NETWORK_ERRORS
+
+
+class GeminiUnavailableError(Exception):
+    """Gemini calls are being shed after repeated transient failures."""
+
+
+class GeminiCircuitBreaker:
+    """
+    Stops sending requests after fail_max consecutive transient failures.
+    Once reset_timeout seconds pass, calls are let through again; the next
+    failure re-opens the circuit and the next success closes it.
+    """
+
+    def __init__(self, fail_max: int = 20, reset_timeout: float = 60):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+
+    def check(self) -> None:
+        """Raise GeminiUnavailableError while the circuit is open."""
+        if self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout:
+            raise GeminiUnavailableError("AI service is temporarily unavailable. Please try again shortly.")
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.fail_max:
+            self._opened_at = time.monotonic()
+
+
+# Global instance
+gemini_breaker = GeminiCircuitBreaker()
+
+
+@lru_cache(maxsize=None)
+def configure_genai(api_key: str) -> None:
+    """
+    Configure the Gemini SDK once per API key.
+    genai.configure drops the SDK's cached clients, so calling it from every
+    service constructor left each service holding its own connection pool.
+    The async client behind generate_content_async already uses the
+    grpc_asyncio transport, so configuring once gives every service one
+    multiplexed HTTP/2 channel. Forcing transport="grpc_asyncio" here would
+    also apply to the SDK's sync clients, which cannot use it.
+    """
+    genai.configure(api_key=api_key)  # type: ignore[attr-defined]
+
+
+# Offline estimate; Gemini averages roughly four characters per token
+CHARS_PER_TOKEN = 4
+
+
+def fit_to_token_budget(text: str, budget: int) -> str:
+    """
+    Trim text to about budget tokens, cutting at the last whitespace so words
+    stay whole. Estimated offline to avoid a count_tokens round trip per prompt.
+    """
+    limit = budget * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    cut = max(cut, text.rfind("\n", 0, limit))
+    return text[:cut if cut > 0 else limit].rstrip() + " ..."
+
+
+@lru_cache(maxsize=None)
+def json_model(model_name: str) -> Any:
+    """
+    Shared JSON-mode GenerativeModel for model_name.
+    Built once per process so every service reuses the same handle and
+    GenerationConfig instead of constructing its own.
+    """
+    try:
+        json_config = genai.types.GenerationConfig(  # type: ignore[attr-defined]
+            response_mime_type="application/json"
+        )
+        return genai.GenerativeModel(model_name, generation_config=json_config)  # type: ignore[attr-defined]
+    except Exception:
+        # Fallback if JSON mode not available in this version
+        return genai.GenerativeModel(model_name)  # type: ignore[attr-defined]
+
+
+async def generate_content(model: Any, prompt: str) -> Any:
+    """
+    Call model.generate_content_async within the shared concurrency window.
+    A new call starts as soon as any in-flight one finishes, so fan-outs
+    stay parallel without bursting past the Gemini quota. Transient Gemini
+    and network errors are retried here, with jittered exponential backoff,
+    and nowhere above; gemini_breaker sheds calls while Gemini keeps failing.
+    """
+    loop = asyncio.get_running_loop()
+    slots = _gemini_slots.get(loop)
+    if slots is None:
+        # Created lazily so the semaphore binds to the serving event loop
+        slots = _gemini_slots[loop] = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+    for attempt in range(GEMINI_MAX_ATTEMPTS):
+        gemini_breaker.check()
+        try:
+            async with slots:
+                response = await model.generate_content_async(prompt)
+        except _TRANSIENT_ERRORS:
+            gemini_breaker.record_failure()
+            if attempt == GEMINI_MAX_ATTEMPTS - 1:
+                raise
+            # Back off outside the semaphore so other calls can use the slot
+            await asyncio.sleep(0.5 * 2 ** attempt + random.uniform(0, 0.5))
+            continue
+        gemini_breaker.record_success()
+        return response
+
+
+# Condensed rubric and schema shared by the fused score/personality/career
+# prompts; each caller names the three section keys its response model uses
+_COMBINED_ANALYSIS_RUBRIC = """
+SCORING RUBRIC ({score_key}):
+- Technical Skills (0-100): Relevance, depth, and currency
+- Experience (0-100): Quality, relevance, career progression
+- Education (0-100): Relevance to goals, academic achievements
+- Communication (0-100): Clarity of writing, presentation
+- Overall Score: Weighted (Tech 30%, Exp 35%, Edu 20%, Comm 15%)
+
+PERSONALITY DIMENSIONS ({personality_key}, 0-100 scale):
+- Extraversion, Conscientiousness, Openness, Agreeableness, Emotional Stability
+- Work Style: "Independent", "Collaborative", "Leadership", "Analytical", "Creative"
+- Leadership Potential and Team Player Score: 0-100 based on track record
+
+CAREER REQUIREMENTS ({career_key}):
+1. Current career level: "Entry Level", "Mid Level", "Senior Level", or "Executive"
+2. Next 3 potential roles (top opportunity first)
+3. Advancement timeline based on skill/experience gaps
+4. Key skill developments needed for progression
+"""
+
+_COMBINED_ANALYSIS_SCHEMA = """{{{leading_sections}
+  "{score_key}": {{
+    "overall_score": <float>,
+    "technical_score": <float>,
+    "experience_score": <float>,
+    "education_score": <float>,
+    "communication_score": <float>,
+    "reasoning": "<1-2 sentences max: key assessment>",
+    "strengths": ["<top strength>", "<second>", "<third>"],
+    "weaknesses": ["<top weakness>", "<second>", "<third>"],
+    "improvement_suggestions": ["<actionable step 1>", "<step 2>", "<step 3>"]
+  }},
+  "{personality_key}": {{
+    "traits": {{
+      "extraversion": <0-100>,
+      "conscientiousness": <0-100>,
+      "openness": <0-100>,
+      "agreeableness": <0-100>,
+      "emotional_stability": <0-100>
+    }},
+    "work_style": "<one of the 5 options>",
+    "leadership_potential": <0-100>,
+    "team_player_score": <0-100>,
+    "analysis": "<2-3 sentences: key personality insights derived from resume>"
+  }},
+  "{career_key}": {{
+    "current_level": "<one of the 4 levels>",
+    "next_roles": ["<top opportunity>", "<second option>", "<third option>"],
+    "timeline": "<e.g., '2-3 years' for next advancement>",
+    "required_development": ["<skill gap 1>", "<skill gap 2>", "<skill gap 3>"]
+  }}
+}}"""
+
+
+def combined_analysis_rubric(score_key: str, personality_key: str, career_key: str) -> str:
+    """Scoring, personality and career rubric for a fused prompt, labelled with the caller's section keys."""
+    return _COMBINED_ANALYSIS_RUBRIC.format(
+        score_key=score_key, personality_key=personality_key, career_key=career_key
+    )
+
+
+def combined_analysis_schema(
+    score_key: str, personality_key: str, career_key: str, leading_sections: str = ""
+) -> str:
+    """
+    JSON schema for a fused prompt's score, personality and career sections.
+    leading_sections is inserted verbatim before them, ending with a comma.
+    """
+    return _COMBINED_ANALYSIS_SCHEMA.format(
+        score_key=score_key, personality_key=personality_key, career_key=career_key,
+        leading_sections=leading_sections
+    )
+
 
 class BasePromptService(ABC):
     """
@@ -24,6 +253,9 @@ class BasePromptService(ABC):
     SUPPORTED_FORMATS = ('.pdf', '.doc', '.docx')
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
+    # Caps free-text user input so one pasted document cannot inflate every prompt
+    JOB_DESCRIPTION_TOKEN_BUDGET = 1000
+
     WARNING_THRESHOLD_BATCHES = 10
     WARNING_THRESHOLD_COMPARISONS = 10
 
@@ -42,17 +274,7 @@ class BasePromptService(ABC):
                 if not genai:
                     raise ImportError("google-generativeai package is not available")
                 # Enable JSON mode for guaranteed valid JSON output
-                try:
-                    json_config = genai.types.GenerationConfig(  # type: ignore[attr-defined]
-                        response_mime_type="application/json"
-                    )
-                    self._model = genai.GenerativeModel(  # type: ignore[attr-defined]
-                        self.DEFAULT_MODEL,
-                        generation_config=json_config
-                    )
-                except Exception:
-                    # Fallback if JSON mode not available in this version
-                    self._model = genai.GenerativeModel(self.DEFAULT_MODEL)  # type: ignore[attr-defined]
+                self._model = json_model(self.DEFAULT_MODEL)
             except ImportError as e:
                 raise ImportError(f"Failed to initialize AI model: {str(e)}")
         return self._model
@@ -92,6 +314,35 @@ class BasePromptService(ABC):
         formatted = [f"- {h[:100]}" for h in highlights_list[:2]]
         return "\n".join(formatted) or "None"
 
+    @staticmethod
+    def duration_months(duration: str) -> Optional[int]:
+        """
+        Months covered by a duration string such as "Jan 2020 - Present" or
+        "2018 - 2021". A single year counts as 12 months; None if no date is found.
+        """
+        points = []
+        for month_name, month_number, year, ongoing in _DURATION_POINT_RE.findall(duration or ""):
+            if ongoing:
+                today = date.today()
+                points.append(today.year * 12 + today.month)
+            else:
+                month = _MONTHS.get(month_name[:3].lower()) if month_name else int(month_number or 1)
+                points.append(int(year) * 12 + min(max(month, 1), 12))
+        if not points:
+            return None
+        if len(points) == 1:
+            return 12
+        return max(points[-1] - points[0], 0)
+
+    @staticmethod
+    def format_years_experience(experience_list: List[Dict[str, Any]]) -> str:
+        """Total years across work-experience durations, for prompt context."""
+        months = [BasePromptService.duration_months(exp.get("duration", "")) for exp in experience_list]
+        known = [m for m in months if m is not None]
+        if not known:
+            return "Not stated"
+        return f"Approximately {sum(known) // 12}"
+
     def build_candidate_profile(self, resume_data: Dict[str, Any]) -> Dict[str, Any]:
         """Build formatted candidate profile slices for prompt context."""
         return {
@@ -107,10 +358,14 @@ class BasePromptService(ABC):
         resume_data: Dict[str, Any],
         *,
         include_personal_info: bool = False,
-        include_highlights: bool = True
+        include_highlights: bool = True,
+        profile: Optional[Dict[str, Any]] = None
     ) -> str:
-        """Render a compact multi-line candidate profile for prompting."""
-        profile = self.build_candidate_profile(resume_data)
+        """
+        Render a compact multi-line candidate profile for prompting.
+        Pass a profile from build_candidate_profile to skip re-formatting the resume.
+        """
+        profile = profile or self.build_candidate_profile(resume_data)
         lines: List[str] = []
 
         def _append(label: str, value: str) -> None:
@@ -143,16 +398,55 @@ class BasePromptService(ABC):
         }
 
     # ========== PARSING UTILITIES ==========
+    @staticmethod
+    def extract_json_block(text: str, start_marker: str = "{", end_marker: str = "}") -> Optional[str]:
+        """
+        Slice the first balanced JSON object or array out of free-form text.
+        Single pass over the text, skipping markers inside string literals.
+        Returns None when no balanced block is found.
+        """
+        start = text.find(start_marker)
+        if start == -1:
+            return None
+        depth = 0
+        in_string = False
+        escaped = False
+        for i in range(start, len(text)):
+            char = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == start_marker:
+                depth += 1
+            elif char == end_marker:
+                depth -= 1
+                if depth == 0:
+                    return text[start:i + 1]
+        return None
+
     @staticmethod
     def parse_json_response(response_text: str, start_marker: str = "{", end_marker: str = "}") -> Dict[str, Any]:
         """
         Parse JSON response from AI model.
         With JSON mode enabled, the model ONLY outputs valid JSON, so direct parsing works.
-        This eliminates complex text extraction logic.
+        Falls back to extracting the first balanced block when the model wraps
+        the JSON in prose (e.g. when JSON mode is unavailable).
         """
         try:
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
+            return orjson.loads(response_text)
+        except orjson.JSONDecodeError as e:
+            block = BasePromptService.extract_json_block(response_text, start_marker, end_marker)
+            if block is not None and block != response_text:
+                try:
+                    return orjson.loads(block)
+                except orjson.JSONDecodeError:
+                    pass
             raise ValueError(f"Failed to parse JSON response: {str(e)}\nResponse: {response_text[:200]}")
 
     @staticmethod
@@ -160,11 +454,17 @@ class BasePromptService(ABC):
         """
         Parse JSON array response from AI model.
         With JSON mode enabled, the model ONLY outputs valid JSON arrays, so direct parsing works.
-        No need to search for '[' and ']' in the text.
+        Falls back to the first balanced '[' ... ']' block otherwise.
         """
         try:
-            return json.loads(response_text)
-        except json.JSONDecodeError as e:
+            return orjson.loads(response_text)
+        except orjson.JSONDecodeError as e:
+            block = BasePromptService.extract_json_block(response_text, "[", "]")
+            if block is not None and block != response_text:
+                try:
+                    return orjson.loads(block)
+                except orjson.JSONDecodeError:
+                    pass
             raise ValueError(f"Failed to parse JSON array response: {str(e)}\nResponse: {response_text[:200]}")
 
     # ========== VALIDATION UTILITIES ==========
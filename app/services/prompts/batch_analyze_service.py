@@ -1,7 +1,7 @@
 import os
 from typing import Dict, List, Any, Optional
 from app.models.schemas import RoleRecommendation
-from app.services.prompts.base_prompt_service import BasePromptService
+from app.services.prompts.base_prompt_service import BasePromptService, configure_genai, generate_content, json_model
 
 try:
     import google.generativeai as genai
@@ -31,7 +31,7 @@ class BatchAnalyzeService(BasePromptService):
             raise ValueError("GOOGLE_API_KEY environment variable is required")
         if not GENAI_AVAILABLE or not genai:
             raise ImportError("google-generativeai package is not available")
-        genai.configure(api_key=self.api_key)  # type: ignore[attr-defined]
+        configure_genai(self.api_key)
         self._model = None
 
     @property
@@ -41,17 +41,7 @@ class BatchAnalyzeService(BasePromptService):
             if not GENAI_AVAILABLE or not genai:
                 raise ImportError("google-generativeai package is not available")
             # Force JSON output from the model
-            try:
-                json_config = genai.types.GenerationConfig(  # type: ignore[attr-defined]
-                    response_mime_type="application/json"
-                )
-                self._model = genai.GenerativeModel(  # type: ignore[attr-defined]
-                    self.DEFAULT_MODEL,
-                    generation_config=json_config
-                )
-            except Exception:
-                # Fallback if JSON mode is not available
-                self._model = genai.GenerativeModel(self.DEFAULT_MODEL)  # type: ignore[attr-defined]
+            self._model = json_model(self.DEFAULT_MODEL)
         return self._model
 
     async def generate(self, resume_data: Dict[str, Any], **kwargs) -> List[RoleRecommendation]:
@@ -59,13 +49,13 @@ class BatchAnalyzeService(BasePromptService):
         Generate general role recommendations for batch processing.
         Args:
             resume_data: Parsed resume data dictionary
-            **kwargs: Additional arguments (not used)
+            **kwargs: profile - optional precomputed build_candidate_profile result
         Returns:
             List of RoleRecommendation objects
         """
         model = self.model
-        prompt = self._create_role_prompt(resume_data)
-        response = await model.generate_content_async(prompt)
+        prompt = self._create_role_prompt(resume_data, kwargs.get("profile"))
+        response = await generate_content(model, prompt)
         
         try:
             role_recommendations = self._parse_recommendations(response.text)
@@ -85,7 +75,8 @@ class BatchAnalyzeService(BasePromptService):
         self,
         resume_data: Dict[str, Any],
         target_role: str,
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, Any]] = None
     ) -> List[RoleRecommendation]:
         """
         Analyze if candidate fits the target role for batch processing.
@@ -93,12 +84,13 @@ class BatchAnalyzeService(BasePromptService):
             resume_data: Parsed resume data dictionary
             target_role: Target job role to analyze fit for
             job_description: Optional job description for better analysis
+            profile: Optional precomputed build_candidate_profile result
         Returns:
             List of RoleRecommendation objects with target role as primary
         """
         model = self.model
-        prompt = self._create_role_fit_prompt(resume_data, target_role, job_description)
-        response = await model.generate_content_async(prompt)
+        prompt = self._create_role_fit_prompt(resume_data, target_role, job_description, profile)
+        response = await generate_content(model, prompt)
         
         try:
             role_recommendations = self._parse_recommendations(response.text)
@@ -115,19 +107,25 @@ class BatchAnalyzeService(BasePromptService):
             raise ValueError(f"Failed to analyze role fit: {str(e)}")
 
     # ========== PROMPT CREATION METHODS ==========
-    def _create_role_prompt(self, resume_data: Dict[str, Any]) -> str:
+    def _create_role_prompt(
+        self,
+        resume_data: Dict[str, Any],
+        profile: Optional[Dict[str, Any]] = None
+    ) -> str:
         """
         Create an optimized prompt for batch role recommendation.
         Ultra-concise format for fast batch processing.
         Args:
             resume_data: Parsed resume data dictionary
+            profile: Optional precomputed build_candidate_profile result
         Returns:
             Formatted prompt string for AI model
         """
         profile_block = self.render_candidate_profile(
             resume_data,
             include_personal_info=False,
-            include_highlights=False
+            include_highlights=False,
+            profile=profile
         )
         prompt = (
             "ROLE: Expert Career Advisor & Technical Recruiter.\n"
@@ -149,7 +147,8 @@ class BatchAnalyzeService(BasePromptService):
         self,
         resume_data: Dict[str, Any],
         target_role: str,
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, Any]] = None
     ) -> str:
         """
         Create an optimized prompt for batch role fit analysis.
@@ -158,13 +157,15 @@ class BatchAnalyzeService(BasePromptService):
             resume_data: Parsed resume data dictionary
             target_role: Target role to analyze
             job_description: Optional job description 
+            profile: Optional precomputed build_candidate_profile result
         Returns:
             Formatted prompt string for AI model
         """
         profile_block = self.render_candidate_profile(
             resume_data,
             include_personal_info=False,
-            include_highlights=False
+            include_highlights=False,
+            profile=profile
         )
         job_section = ""
         if job_description:
@@ -1,9 +1,14 @@
-import json
+import asyncio
+import orjson
 from typing import Dict, Any, List
-from app.services.prompts.base_prompt_service import BasePromptService
+from app.services.prompts.base_prompt_service import BasePromptService, fit_to_token_budget, generate_content
 
 
 class CandidateSelectionService(BasePromptService):
+    # Candidates per combined prompt, and the resume text budget for each of them
+    BATCH_SIZE = 5
+    BATCH_RESUME_TOKEN_BUDGET = 3000
+
     def __init__(self):
         super().__init__()
 
@@ -49,6 +54,46 @@ Rules:
 
         return prompt
 
+    def _create_batch_fit_evaluation_prompt(
+        self, resume_contents: List[str], job_title: str, keywords: List[str]
+    ) -> str:
+        """
+        Create a prompt evaluating several candidates against the same job at once.
+        Returns JSON with one status and message per candidate.
+        """
+        keywords_str = ", ".join(keywords)
+        candidates = "\n\n".join(
+            f"Candidate {number}:\n{fit_to_token_budget(content, self.BATCH_RESUME_TOKEN_BUDGET)}"
+            for number, content in enumerate(resume_contents, start=1)
+        )
+
+        return f"""You are a recruitment expert evaluating candidates for a position.
+
+Job Title: {job_title}
+Required Keywords/Skills: {keywords_str}
+
+{candidates}
+
+Evaluate each of the {len(resume_contents)} candidates independently as a FIT or REJECT based on whether their resume contains the required keywords/skills.
+
+Respond ONLY with valid JSON in this exact format:
+{{
+    "candidates": [
+        {{
+            "candidate_id": <candidate number>,
+            "status": "FIT" or "REJECT",
+            "message": "Brief one-line reason (max 100 characters)"
+        }}
+    ]
+}}
+
+Rules:
+- Include exactly one entry per candidate, in candidate order
+- FIT: Candidate has most/all required keywords/skills mentioned in their resume
+- REJECT: Candidate is missing most required keywords/skills
+- Message should be concise and actionable
+- Do NOT include any text outside the JSON"""
+
     async def evaluate_candidate(
         self, resume_content: str, job_title: str, keywords: List[str]
     ) -> Dict[str, str]:
@@ -67,7 +112,7 @@ Rules:
             model = self.model
             prompt = self._create_fit_evaluation_prompt(resume_content, job_title, keywords)
             
-            response = await model.generate_content_async(prompt)
+            response = await generate_content(model, prompt)
             
             if not response or not response.text:
                 raise ValueError("Empty response from AI model")
@@ -77,6 +122,95 @@ Rules:
         except Exception as e:
             raise ValueError(f"Failed to evaluate candidate: {str(e)}")
 
+    async def evaluate_candidates_batch(
+        self, resume_contents: List[str], job_title: str, keywords: List[str]
+    ) -> List[Dict[str, str]]:
+        """
+        Evaluate several candidates, BATCH_SIZE per model call.
+        
+        Args:
+            resume_contents: Extracted text from each resume
+            job_title: Target job position
+            keywords: List of required skills/keywords
+            
+        Returns:
+            One {'status', 'message'} dict per resume, in input order;
+            candidates that cannot be evaluated come back as REJECT
+        """
+        chunks = [
+            resume_contents[start:start + self.BATCH_SIZE]
+            for start in range(0, len(resume_contents), self.BATCH_SIZE)
+        ]
+        chunk_results = await asyncio.gather(*(
+            self._evaluate_chunk(chunk, job_title, keywords) for chunk in chunks
+        ))
+        return [evaluation for evaluations in chunk_results for evaluation in evaluations]
+
+    async def _evaluate_chunk(
+        self, resume_contents: List[str], job_title: str, keywords: List[str]
+    ) -> List[Dict[str, str]]:
+        """
+        One combined call for the chunk. If its reply is unusable only this
+        chunk falls back to single evaluations, so other chunks' results stand.
+        """
+        if len(resume_contents) > 1:
+            try:
+                return await self._evaluate_combined(resume_contents, job_title, keywords)
+            except Exception as e:
+                print(f"Batch evaluation failed, evaluating its candidates individually: {str(e)}")
+
+        return list(await asyncio.gather(*(
+            self._evaluate_or_reject(content, job_title, keywords) for content in resume_contents
+        )))
+
+    async def _evaluate_or_reject(
+        self, resume_content: str, job_title: str, keywords: List[str]
+    ) -> Dict[str, str]:
+        """evaluate_candidate, with a failure turned into a REJECT decision."""
+        try:
+            return await self.evaluate_candidate(resume_content, job_title, keywords)
+        except Exception as e:
+            return {"status": "REJECT", "message": f"Could not parse file: {str(e)[:50]}"}
+
+    async def _evaluate_combined(
+        self, resume_contents: List[str], job_title: str, keywords: List[str]
+    ) -> List[Dict[str, str]]:
+        try:
+            model = self.model
+            prompt = self._create_batch_fit_evaluation_prompt(resume_contents, job_title, keywords)
+
+            response = await generate_content(model, prompt)
+
+            if not response or not response.text:
+                raise ValueError("Empty response from AI model")
+
+            decisions = {
+                int(item["candidate_id"]): self._normalize_decision(item)
+                for item in self.parse_json_response(response.text)["candidates"]
+            }
+            missing = [n for n in range(1, len(resume_contents) + 1) if n not in decisions]
+            if missing:
+                raise ValueError(f"no decision for candidates {missing}")
+            return [decisions[n] for n in range(1, len(resume_contents) + 1)]
+        except Exception as e:
+            raise ValueError(f"Failed to evaluate candidate batch: {str(e)}") from e
+
+    @staticmethod
+    def _normalize_decision(data: Dict[str, Any]) -> Dict[str, str]:
+        """Coerce a parsed decision to a FIT/REJECT status and a short message."""
+        status = str(data.get("status", "")).upper()
+        if status not in ["FIT", "REJECT"]:
+            status = "REJECT"  # Default to reject if invalid
+        
+        # The model sometimes returns null, a number or a list here
+        message = data.get("message")
+        message = "Could not evaluate" if message is None else str(message)
+        
+        return {
+            "status": status,
+            "message": message[:100]  # Limit to 100 chars
+        }
+
     def _parse_selection_response(self, response_text: str) -> Dict[str, str]:
         """
         Parse AI response to extract status and message.
@@ -97,20 +231,11 @@ Rules:
             elif "```" in json_str:
                 json_str = json_str.split("```")[1].split("```")[0].strip()
             
-            data = json.loads(json_str)
+            data = orjson.loads(json_str)
             
             # Validate required fields
-            status = data.get("status", "").upper()
-            if status not in ["FIT", "REJECT"]:
-                status = "REJECT"  # Default to reject if invalid
-            
-            message = data.get("message", "Could not evaluate")
-            
-            return {
-                "status": status,
-                "message": message[:100]  # Limit to 100 chars
-            }
-        except json.JSONDecodeError:
+            return self._normalize_decision(data)
+        except orjson.JSONDecodeError:
             # Fallback if JSON parsing fails
             if "reject" in response_text.lower():
                 return {"status": "REJECT", "message": "Could not fully evaluate"}
@@ -1,7 +1,7 @@
 import os
 from typing import Dict, List, Any, Optional
 from app.models.schemas import RoleRecommendation
-from app.services.prompts.base_prompt_service import BasePromptService
+from app.services.prompts.base_prompt_service import BasePromptService, configure_genai, generate_content, json_model
 
 try:
     import google.generativeai as genai
@@ -31,7 +31,7 @@ class CompareResumesService(BasePromptService):
             raise ValueError("GOOGLE_API_KEY environment variable is required")
         if not GENAI_AVAILABLE or not genai:
             raise ImportError("google-generativeai package is not available")
-        genai.configure(api_key=self.api_key)  # type: ignore[attr-defined]
+        configure_genai(self.api_key)
         self._model = None
 
     @property
@@ -41,17 +41,7 @@ class CompareResumesService(BasePromptService):
             if not GENAI_AVAILABLE or not genai:
                 raise ImportError("google-generativeai package is not available")
             # Force JSON output from the model
-            try:
-                json_config = genai.types.GenerationConfig(  # type: ignore[attr-defined]
-                    response_mime_type="application/json"
-                )
-                self._model = genai.GenerativeModel(  # type: ignore[attr-defined]
-                    self.DEFAULT_MODEL,
-                    generation_config=json_config
-                )
-            except Exception:
-                # Fallback if JSON mode is not available
-                self._model = genai.GenerativeModel(self.DEFAULT_MODEL)  # type: ignore[attr-defined]
+            self._model = json_model(self.DEFAULT_MODEL)
         return self._model
 
     async def generate(self, resume_data: Dict[str, Any], **kwargs) -> List[RoleRecommendation]:
@@ -66,7 +56,7 @@ class CompareResumesService(BasePromptService):
         """
         model = self.model
         prompt = self._create_role_prompt(resume_data)
-        response = await model.generate_content_async(prompt)
+        response = await generate_content(model, prompt)
         
         try:
             role_recommendations = self._parse_recommendations(response.text)
@@ -97,7 +87,7 @@ class CompareResumesService(BasePromptService):
         """
         model = self.model
         prompt = self._create_comparison_prompt(resumes_data, target_role)
-        response = await model.generate_content_async(prompt)
+        response = await generate_content(model, prompt)
         
         try:
             analysis = self._parse_comparison_analysis(response.text)
@@ -120,7 +110,7 @@ class CompareResumesService(BasePromptService):
         """
         model = self.model
         prompt = self._create_detailed_comparison_prompt(resumes_data, target_role)
-        response = await model.generate_content_async(prompt)
+        response = await generate_content(model, prompt)
         
         try:
             analysis = self._parse_detailed_comparison(response.text)
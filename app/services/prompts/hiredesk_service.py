@@ -1,7 +1,7 @@
 import os
 from typing import Dict, List, Any, Optional
 from app.models.schemas import RoleRecommendation
-from app.services.prompts.base_prompt_service import BasePromptService
+from app.services.prompts.base_prompt_service import BasePromptService, configure_genai, generate_content, json_model
 
 try:
     import google.generativeai as genai
@@ -31,7 +31,7 @@ class HiredeskService(BasePromptService):
             raise ValueError("GOOGLE_API_KEY environment variable is required")
         if not GENAI_AVAILABLE or not genai:
             raise ImportError("google-generativeai package is not available")
-        genai.configure(api_key=self.api_key)  # type: ignore[attr-defined]
+        configure_genai(self.api_key)
         self._model = None
 
     @property
@@ -41,17 +41,7 @@ class HiredeskService(BasePromptService):
             if not GENAI_AVAILABLE or not genai:
                 raise ImportError("google-generativeai package is not available")
             # Force JSON output from the model
-            try:
-                json_config = genai.types.GenerationConfig(  # type: ignore[attr-defined]
-                    response_mime_type="application/json"
-                )
-                self._model = genai.GenerativeModel(  # type: ignore[attr-defined]
-                    self.DEFAULT_MODEL,
-                    generation_config=json_config
-                )
-            except Exception:
-                # Fallback if JSON mode is not available
-                self._model = genai.GenerativeModel(self.DEFAULT_MODEL)  # type: ignore[attr-defined]
+            self._model = json_model(self.DEFAULT_MODEL)
         return self._model
 
     async def generate(self, resume_data: Dict[str, Any], **kwargs) -> List[RoleRecommendation]:
@@ -59,13 +49,13 @@ class HiredeskService(BasePromptService):
         Generate general role recommendations for comprehensive analysis.
         Args:
             resume_data: Parsed resume data dictionary
-            **kwargs: Additional arguments (not used)
+            **kwargs: profile - optional pre-built candidate profile to reuse
         Returns:
             List of RoleRecommendation objects
         """
         model = self.model
-        prompt = self._create_role_prompt(resume_data)
-        response = await model.generate_content_async(prompt)
+        prompt = self._create_role_prompt(resume_data, kwargs.get("profile"))
+        response = await generate_content(model, prompt)
         
         try:
             role_recommendations = self._parse_recommendations(response.text)
@@ -85,7 +75,8 @@ class HiredeskService(BasePromptService):
         self,
         resume_data: Dict[str, Any],
         target_role: str,
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, Any]] = None
     ) -> List[RoleRecommendation]:
         """
         Analyze if candidate fits the target role.
@@ -93,12 +84,13 @@ class HiredeskService(BasePromptService):
             resume_data: Parsed resume data dictionary
             target_role: Target job role to analyze fit for
             job_description: Optional job description for better analysis
+            profile: Optional pre-built candidate profile to reuse
         Returns:
             List of RoleRecommendation objects with target role as primary
         """
         model = self.model
-        prompt = self._create_role_fit_prompt(resume_data, target_role, job_description)
-        response = await model.generate_content_async(prompt)
+        prompt = self._create_role_fit_prompt(resume_data, target_role, job_description, profile)
+        response = await generate_content(model, prompt)
         
         try:
             role_recommendations = self._parse_recommendations(response.text)
@@ -118,7 +110,8 @@ class HiredeskService(BasePromptService):
         self,
         resume_data: Dict[str, Any],
         target_role: Optional[str] = None,
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, str]]:
         """
         Generate interview questions tailored to the candidate and role.
@@ -126,6 +119,7 @@ class HiredeskService(BasePromptService):
             resume_data: Parsed resume data dictionary
             target_role: Optional target role for role-specific questions
             job_description: Optional job description for better questions
+            profile: Optional pre-built candidate profile to reuse
         Returns:
             List of question dictionaries with type, question, and context
         """
@@ -133,12 +127,12 @@ class HiredeskService(BasePromptService):
         
         if target_role:
             prompt = self._create_role_specific_questions_prompt(
-                resume_data, target_role, job_description
+                resume_data, target_role, job_description, profile
             )
         else:
-            prompt = self._create_general_questions_prompt(resume_data)
+            prompt = self._create_general_questions_prompt(resume_data, profile)
         
-        response = await model.generate_content_async(prompt)
+        response = await generate_content(model, prompt)
         
         try:
             questions = self._parse_questions(response.text)
@@ -147,9 +141,11 @@ class HiredeskService(BasePromptService):
             raise ValueError(f"Failed to generate interview questions: {str(e)}")
 
     # ========== PROMPT CREATION METHODS ==========
-    def _create_role_prompt(self, resume_data: Dict[str, Any]) -> str:
+    def _create_role_prompt(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, Any]] = None
+    ) -> str:
         """Create optimized structured prompt for role recommendations."""
-        profile_block = self.render_candidate_profile(resume_data)
+        profile_block = self.render_candidate_profile(resume_data, profile=profile)
         prompt = (
             "ROLE: Expert Career Advisor & Technical Recruiter.\n"
             "TASK: Produce JSON array of exactly 5 best-fit roles sorted by matchPercentage (integer 0-100).\n"
@@ -169,10 +165,11 @@ class HiredeskService(BasePromptService):
         self,
         resume_data: Dict[str, Any],
         target_role: str,
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, Any]] = None
     ) -> str:
         """Create optimized structured prompt for role fit analysis."""
-        profile_block = self.render_candidate_profile(resume_data)
+        profile_block = self.render_candidate_profile(resume_data, profile=profile)
         job_section = ""
         if job_description:
             job_section = f"\nJOB DESCRIPTION (truncated to 300 chars):\n{job_description[:300]}"
@@ -192,12 +189,15 @@ class HiredeskService(BasePromptService):
         )
         return prompt
 
-    def _create_general_questions_prompt(self, resume_data: Dict[str, Any]) -> str:
+    def _create_general_questions_prompt(
+        self, resume_data: Dict[str, Any], profile: Optional[Dict[str, Any]] = None
+    ) -> str:
         """Create optimized structured prompt for general interview questions."""
         profile_block = self.render_candidate_profile(
             resume_data,
             include_personal_info=False,
-            include_highlights=False
+            include_highlights=False,
+            profile=profile
         )
 
         prompt = (
@@ -216,13 +216,15 @@ class HiredeskService(BasePromptService):
         self,
         resume_data: Dict[str, Any],
         target_role: str,
-        job_description: Optional[str] = None
+        job_description: Optional[str] = None,
+        profile: Optional[Dict[str, Any]] = None
     ) -> str:
         """Create optimized structured prompt for role-specific questions."""
         profile_block = self.render_candidate_profile(
             resume_data,
             include_personal_info=False,
-            include_highlights=False
+            include_highlights=False,
+            profile=profile
         )
         job_section = ""
         if job_description:
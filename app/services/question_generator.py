@@ -1,6 +1,6 @@
 from typing import Dict, List, Any, Optional
 from app.models.schemas import Question
-from app.services.prompts.base_prompt_service import BasePromptService
+from app.services.prompts.base_prompt_service import BasePromptService, configure_genai, generate_content, json_model
 import os
 
 try:
@@ -26,7 +26,7 @@ class QuestionGenerator(BasePromptService):
             raise ValueError("GOOGLE_API_KEY environment variable is required")
         if not GENAI_AVAILABLE or not genai:
             raise ImportError("google-generativeai package is not available")
-        genai.configure(api_key=self.api_key)
+        configure_genai(self.api_key)
 
     @property
     def model(self):
@@ -34,16 +34,7 @@ class QuestionGenerator(BasePromptService):
         if self._model is None:
             if not GENAI_AVAILABLE or not genai:
                 raise ImportError("google-generativeai package is not available")
-            try:
-                json_config = genai.types.GenerationConfig(
-                    response_mime_type="application/json"
-                )
-                self._model = genai.GenerativeModel(
-                    self.DEFAULT_MODEL,
-                    generation_config=json_config
-                )
-            except Exception:
-                self._model = genai.GenerativeModel(self.DEFAULT_MODEL)
+            self._model = json_model(self.DEFAULT_MODEL)
         return self._model
 
     async def generate(self, resume_data: Dict[str, Any], **kwargs) -> List[Question]:
@@ -57,7 +48,7 @@ class QuestionGenerator(BasePromptService):
         """
         model = self.model
         prompt = self._create_prompt(resume_data)
-        response = await model.generate_content_async(prompt)
+        response = await generate_content(model, prompt)
 
         try:
             raw_questions = self._parse_questions(response.text)
@@ -90,7 +81,7 @@ class QuestionGenerator(BasePromptService):
         """
         model = self.model
         prompt = self._create_role_specific_prompt(resume_data, target_role, job_description)
-        response = await model.generate_content_async(prompt)
+        response = await generate_content(model, prompt)
 
         try:
             raw_questions = self._parse_questions(response.text)
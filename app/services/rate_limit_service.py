@@ -1,11 +1,14 @@
 import os
 import asyncio
-from typing import Dict, Optional
+import secrets
+import time
+from typing import Dict, Optional, Tuple
 import aiohttp
 import logging
 
 logger = logging.getLogger(__name__)
 
+
 class RateLimitService:
     def __init__(self):
         self.auth_service_url = os.getenv("AUTH_SERVICE_URL", "https://jobpsych-auth.vercel.app/api")
@@ -14,6 +17,47 @@ class RateLimitService:
         self.batch_size_limit = 5
         self.free_tier_limit = 10
         self.selected_candidate_limit = 10 # Higher limit for candidate selection
+        self.concurrent_request_limit = 3
+        self.concurrent_request_window = 300  # seconds before an in-flight entry is considered stale
+        # email -> {request_id: started_at}
+        self._in_flight: Dict[str, Dict[str, float]] = {}
+        # (counter, email) -> quota reserved by requests that have not incremented yet
+        self._reservations: Dict[Tuple[str, str], int] = {}
+        self._user_locks: Dict[str, asyncio.Lock] = {}
+
+    async def acquire_concurrency_slot(self, email: str, max_inflight: Optional[int] = None) -> Optional[str]:
+        """
+        Claim one of the user's in-flight analysis slots.
+        Entries older than concurrent_request_window are dropped first so a
+        crashed request cannot hold a slot forever.
+        Returns: a request id to pass to release_concurrency_slot, or None if
+        the user already has max_inflight requests running
+        """
+        normalized_email = email.lower().strip()
+        max_inflight = max_inflight or self.concurrent_request_limit
+        now = time.monotonic()
+
+        in_flight = self._in_flight.setdefault(normalized_email, {})
+        stale_before = now - self.concurrent_request_window
+        for stale_id in [rid for rid, started in in_flight.items() if started < stale_before]:
+            del in_flight[stale_id]
+
+        if len(in_flight) >= max_inflight:
+            return None
+
+        request_id = secrets.token_hex(4)
+        in_flight[request_id] = now
+        return request_id
+
+    async def release_concurrency_slot(self, email: str, request_id: str) -> None:
+        """Free a slot claimed by acquire_concurrency_slot."""
+        normalized_email = email.lower().strip()
+        in_flight = self._in_flight.get(normalized_email)
+        if in_flight is None:
+            return
+        in_flight.pop(request_id, None)
+        if not in_flight:
+            del self._in_flight[normalized_email]
 
     async def check_files_uploaded_limit(self, email: str) -> Dict:
         """
@@ -64,6 +108,49 @@ class RateLimitService:
     async def check_user_upload_limit(self, email: str) -> Dict:
         return await self.check_files_uploaded_limit(email)
 
+    def _user_lock(self, email: str) -> asyncio.Lock:
+        lock = self._user_locks.get(email)
+        if lock is None:
+            lock = self._user_locks[email] = asyncio.Lock()
+        return lock
+
+    def release_reservation(self, counter: str, email: str, count: int = 1) -> None:
+        """
+        Return quota reserved by check_and_reserve_* once the request has
+        incremented the real counter or given up.
+        """
+        normalized_email = email.lower().strip()
+        key = (counter, normalized_email)
+        remaining = self._reservations.get(key, 0) - count
+        if remaining > 0:
+            self._reservations[key] = remaining
+        else:
+            self._reservations.pop(key, None)
+
+    async def check_and_reserve_upload_limit(self, email: str, count: int = 1) -> Dict:
+        """
+        Check the filesUploaded limit and reserve count uploads in one step.
+        Checks for the same user are serialized and see quota already reserved
+        by in-flight requests, so two concurrent requests cannot both claim the
+        last remaining upload. When allowed, the caller must later call
+        release_reservation("files_uploaded", email, count).
+        """
+        normalized_email = email.lower().strip()
+        key = ("files_uploaded", normalized_email)
+        async with self._user_lock(normalized_email):
+            status = await self.check_files_uploaded_limit(normalized_email)
+            pending = self._reservations.get(key, 0)
+            current_count = status["current_count"] + pending
+            allowed = current_count + count <= status["limit"]
+            if allowed:
+                self._reservations[key] = pending + count
+            return {
+                **status,
+                "allowed": allowed,
+                "current_count": current_count,
+                "remaining": max(0, status["limit"] - current_count)
+            }
+
     async def increment_files_uploaded(self, email: str, count: int = 1) -> bool:
         """
         Increment filesUploaded counter for hiredesk_analyze
@@ -151,7 +238,7 @@ class RateLimitService:
         except Exception as e:
             return False
 
-    async def check_batch_analysis_limit(self, email: str, batch_size: int) -> Dict:
+    async def check_batch_analysis_limit(self, email: str, batch_size: int, pending: int = 0) -> Dict:
         try:
             # Validate batch size (max 5 files per batch)
             if batch_size > self.batch_size_limit:
@@ -178,7 +265,7 @@ class RateLimitService:
                     "would_exceed_by": 0
                 }
 
-            current_batch_count = usage.get("batch_analysis", 0)
+            current_batch_count = usage.get("batch_analysis", 0) + pending
             
             # Check if adding this batch would exceed the free tier limit (10 files)
             total_after_upload = current_batch_count + batch_size
@@ -238,6 +325,22 @@ class RateLimitService:
                 "would_exceed_by": 0
             }
 
+    async def check_and_reserve_batch_analysis_limit(self, email: str, batch_size: int) -> Dict:
+        """
+        check_batch_analysis_limit that also reserves the files it allows.
+        When files_allowed > 0 the caller must later call
+        release_reservation("batch_analysis", email, files_allowed).
+        """
+        normalized_email = email.lower().strip()
+        key = ("batch_analysis", normalized_email)
+        async with self._user_lock(normalized_email):
+            pending = self._reservations.get(key, 0)
+            result = await self.check_batch_analysis_limit(normalized_email, batch_size, pending)
+            files_allowed = result.get("files_allowed", 0)
+            if files_allowed > 0:
+                self._reservations[key] = pending + files_allowed
+            return result
+
     async def check_compare_resumes_limit(self, email: str, resume_count: int) -> Dict:
         try:
             # Validate resume count (max 5 resumes per comparison)
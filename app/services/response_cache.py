@@ -0,0 +1,43 @@
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    In-process TTL cache for analysis responses.
+    Keyed by user and a content hash of the uploaded file so repeated
+    submissions of the same resume skip the LLM pipeline.
+    """
+
+    def __init__(self, ttl: int = 900, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(email: str, content_hash: str) -> str:
+        return f"resume:{email.lower().strip()}:{content_hash}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store value under key for the configured TTL."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Global instance
+response_cache = ResponseCache()
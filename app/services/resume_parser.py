@@ -1,12 +1,19 @@
-from pypdf import PdfReader
+import pypdfium2 as pdfium
 import docx
-import pdfplumber
 from fastapi import UploadFile, HTTPException
 import re
-from typing import Dict, Any
-import json
+from typing import Dict, Any, Optional
+import asyncio
+import hashlib
+import orjson
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
+import multiprocessing
 import os
+import threading
+from app.services.prompts.base_prompt_service import configure_genai, fit_to_token_budget, generate_content, json_model
+from app.services.response_cache import ResponseCache
 
 try:
     import google.generativeai as genai
@@ -16,6 +23,130 @@ except ImportError:
     GENAI_AVAILABLE = False
 
 
+class ResumeParseError(Exception):
+    """Base class for errors reading an uploaded resume file."""
+
+
+class PdfParseError(ResumeParseError):
+    """The PDF could not be read by either pypdfium2 or pdfplumber."""
+
+
+class DocxParseError(ResumeParseError):
+    """The Word document could not be read or contained no text."""
+
+
+# Upper bound on extracted resume text sent for structuring (~10 dense pages)
+RESUME_TEXT_TOKEN_BUDGET = 8000
+
+# Compiled once; only needed when the model answers outside JSON mode
+_JSON_RE = re.compile(r'({.*})', re.DOTALL)
+
+_EXTRACT_POOL: Optional[ProcessPoolExecutor] = None
+_EXTRACT_POOL_UNAVAILABLE = False
+
+# PDFium is not thread-safe; serialises extraction when it falls back to the thread pool
+_PDFIUM_LOCK = threading.Lock()
+
+
+def _get_extract_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Lazily create the process pool used for text extraction.
+    Returns None (the loop's default thread pool) where processes cannot be
+    spawned, e.g. serverless runtimes without /dev/shm.
+    """
+    global _EXTRACT_POOL, _EXTRACT_POOL_UNAVAILABLE
+    if _EXTRACT_POOL is None and not _EXTRACT_POOL_UNAVAILABLE:
+        try:
+            _EXTRACT_POOL = ProcessPoolExecutor(
+                max_workers=int(os.getenv("PARSE_WORKERS", "0")) or None,
+                # Forking a process that runs an event loop and threads can copy held locks
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        except (OSError, NotImplementedError):
+            _EXTRACT_POOL_UNAVAILABLE = True
+    return _EXTRACT_POOL
+
+
+def _discard_extract_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next _get_extract_pool call builds a new one."""
+    global _EXTRACT_POOL
+    # Another request may already have replaced it
+    if _EXTRACT_POOL is pool:
+        _EXTRACT_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_extract_pool() -> None:
+    """Stop the extraction workers; called from the app's shutdown hook."""
+    global _EXTRACT_POOL
+    pool, _EXTRACT_POOL = _EXTRACT_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def extract_text(content: bytes, filename: str) -> str:
+    """
+    Extract text from PDF or DOCX bytes.
+    Module-level and free of async/HTTP types so it can run in a worker process.
+    Raises: PdfParseError / DocxParseError if the document cannot be read,
+    ValueError for unsupported formats or files with no text
+    """
+    text = ""
+    file_bytes = BytesIO(content)
+    filename = filename.lower()
+
+    if filename.endswith('.pdf'):
+        try:
+            # PDFium extracts text natively; pdfplumber (pure Python) is the fallback
+            with _PDFIUM_LOCK:
+                pdf = pdfium.PdfDocument(content)
+                try:
+                    # Image-only pages yield no text; skip them rather than joining blanks
+                    text = " ".join([page_text for page in pdf if (page_text := page.get_textpage().get_text_range())])
+                finally:
+                    pdf.close()
+        except Exception as e:
+            try:
+                # Imported on demand: pdfminer is slow to load and only needed when PDFium fails
+                import pdfplumber
+
+                file_bytes.seek(0)  
+                with pdfplumber.open(file_bytes) as pdf:
+                    # pdfplumber returns None for pages without a text layer
+                    text = " ".join([page_text for page in pdf.pages if (page_text := page.extract_text())])
+            except Exception as pdf_e:
+                raise PdfParseError(f"Failed to read PDF file: {str(e)}. pdfplumber error: {str(pdf_e)}")
+
+    elif filename.endswith(('.doc', '.docx')):
+        try:
+            file_bytes.seek(0) 
+            doc = docx.Document(file_bytes)
+            paragraphs = [paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()]
+            if not paragraphs:
+                for table in doc.tables:
+                    for row in table.rows:
+                        paragraphs.extend(cell.text.strip() for cell in row.cells if cell.text.strip())
+            
+            text = " ".join(paragraphs)
+            
+            if not text.strip():
+                raise ValueError(
+                    "No readable text found in the Word document. Please check if the document contains text content."
+                )
+        except Exception as e:
+            raise DocxParseError(
+                f"Failed to read Word document: {str(e)}. Please ensure the document is not corrupted and is a valid .doc or .docx file."
+            )
+
+    else:
+        raise ValueError("Unsupported file format. Please upload a PDF or DOCX file.")
+
+    if not text.strip():
+        raise ValueError("No text could be extracted from the file.")
+        
+    return text.strip()
+
+
 class ResumeParser:
     def __init__(self):
         self.api_key = os.getenv("GOOGLE_API_KEY")
@@ -25,8 +156,10 @@ class ResumeParser:
         if not GENAI_AVAILABLE or not genai:
             raise ImportError("google-generativeai package is not available")
             
-        genai.configure(api_key=self.api_key)
+        configure_genai(self.api_key)
         self._model = None
+        # Structured results keyed by a hash of the extracted text, so re-uploads skip Gemini
+        self._cache = ResponseCache(ttl=3600, max_entries=1024)
 
     @property
     def model(self):
@@ -34,7 +167,8 @@ class ResumeParser:
         if self._model is None:
             if not GENAI_AVAILABLE or not genai:
                 raise ImportError("google-generativeai package is not available")
-            self._model = genai.GenerativeModel('gemini-2.5-flash')
+            # JSON mode makes the model return the bare object, no prose to strip
+            self._model = json_model('gemini-2.5-flash')
         return self._model
 
     async def parse(self, file: UploadFile) -> Dict[str, Any]:
@@ -46,67 +180,25 @@ class ResumeParser:
         return await self._analyze_with_gemini(content)
 
     async def _extract_text(self, file: UploadFile) -> str:
-        """Extract text from PDF or DOCX file"""
+        """Extract text from PDF or DOCX file in a worker process"""
         if not file.filename:
             raise HTTPException(status_code=400, detail="No filename provided")
             
         try:
             content = await file.read()
-            text = ""
-            file_bytes = BytesIO(content)
-            filename = file.filename.lower()
-
-            if filename.endswith('.pdf'):
-                try:
-                    pdf_reader = PdfReader(file_bytes)
-                    text = " ".join(page.extract_text() for page in pdf_reader.pages)
-                except Exception as e:
-                    try:
-                        file_bytes.seek(0)  
-                        with pdfplumber.open(file_bytes) as pdf:
-                            text = " ".join(page.extract_text() for page in pdf.pages)
-                    except Exception as pdf_e:
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"Failed to read PDF file: {str(e)}. pdfplumber error: {str(pdf_e)}"                        )
-            
-            elif filename.endswith(('.doc', '.docx')):
-                try:
-                    file_bytes.seek(0) 
-                    doc = docx.Document(file_bytes)
-                    paragraphs = [paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()]
-                    if not paragraphs:
-                        for table in doc.tables:
-                            for row in table.rows:
-                                paragraphs.extend(cell.text.strip() for cell in row.cells if cell.text.strip())
-                    
-                    text = " ".join(paragraphs)
-                    
-                    if not text.strip():
-                        raise HTTPException(
-                            status_code=400,
-                            detail="No readable text found in the Word document. Please check if the document contains text content."
-                        )
-                except Exception as e:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Failed to read Word document: {str(e)}. Please ensure the document is not corrupted and is a valid .doc or .docx file."
-                    )
-            
-            else:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Unsupported file format. Please upload a PDF or DOCX file."
-                )
-
-            if not text.strip():
-                raise HTTPException(
-                    status_code=400,
-                    detail="No text could be extracted from the file."
-                )
-                
-            return text.strip()
-            
+            loop = asyncio.get_running_loop()
+            pool = _get_extract_pool()
+            try:
+                return await loop.run_in_executor(pool, extract_text, content, file.filename)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed) and took the pool with it; retry on a fresh one.
+                # Only a process pool can break, so the thread pool fallback re-raises as is.
+                if pool is None:
+                    raise
+                _discard_extract_pool(pool)
+                return await loop.run_in_executor(_get_extract_pool(), extract_text, content, file.filename)
+        except ResumeParseError:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=500,
@@ -116,6 +208,12 @@ class ResumeParser:
     async def _analyze_with_gemini(self, text: str) -> Dict[str, Any]:
         """Use Google Gemini to analyze resume text"""
         try:
+            text = fit_to_token_budget(text, RESUME_TEXT_TOKEN_BUDGET)
+            cache_key = f"parse:{hashlib.blake2b(text.encode(), digest_size=16).hexdigest()}"
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return orjson.loads(cached)
+
             prompt = f"""
             Analyze the following resume text and extract information in JSON format:
             
@@ -154,23 +252,28 @@ class ResumeParser:
             2. Split descriptions into clear bullet points
             3. Extract all relevant skills mentioned
             4. Keep the exact JSON structure as shown
-            5. Return only the JSON object, no additional text
             """
             model = self.model
-            response = await model.generate_content_async(prompt)
+            response = await generate_content(model, prompt)
             response_text = response.text
 
             if not response_text:
                 raise ValueError("No response from Gemini")
                 
-            json_str = re.search(r'({.*})', response_text, re.DOTALL)
-            if not json_str:
-                raise ValueError("No JSON found in response")
-                
-            result = json.loads(json_str.group(1))
+            try:
+                result = orjson.loads(response_text)
+            except orjson.JSONDecodeError:
+                # Non-JSON-mode fallback may wrap the object in prose
+                json_str = _JSON_RE.search(response_text)
+                if not json_str:
+                    raise ValueError("No JSON found in response")
+                result = orjson.loads(json_str.group(1))
+
+            # Stored serialized so every cache hit hands out a fresh dict
+            self._cache.set(cache_key, orjson.dumps(result))
             return result
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to parse resume analysis result: {str(e)}"
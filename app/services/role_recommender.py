@@ -1,5 +1,5 @@
 from typing import Dict, List, Any, Optional
-from app.services.prompts.base_prompt_service import BasePromptService
+from app.services.prompts.base_prompt_service import BasePromptService, fit_to_token_budget, generate_content
 from app.models.schemas import RoleRecommendation
 
 try:
@@ -18,7 +18,7 @@ class RoleRecommender(BasePromptService):
         """Recommend suitable job roles based on resume data."""
         model = self.model
         prompt = self._create_role_prompt(resume_data)
-        response = await model.generate_content_async(prompt)
+        response = await generate_content(model, prompt)
         try:
             role_recommendations = self._parse_recommendations(response.text)
             return [
@@ -37,7 +37,7 @@ class RoleRecommender(BasePromptService):
         """Analyze if candidate fits the target role and provide alternatives."""
         model = self.model
         prompt = self._create_role_fit_prompt(resume_data, target_role, job_description)
-        response = await model.generate_content_async(prompt)
+        response = await generate_content(model, prompt)
         try:
             role_recommendations = self._parse_recommendations(response.text)
             return [
@@ -112,7 +112,10 @@ OUTPUT: Return ONLY the JSON array with exactly 5 role recommendations, sorted b
             include_personal_info=True,
             include_highlights=True
         )
-        job_context = f"\n\nJob Description:\n{job_description}" if job_description else ""
+        job_context = (
+            f"\n\nJob Description:\n{fit_to_token_budget(job_description, self.JOB_DESCRIPTION_TOKEN_BUDGET)}"
+            if job_description else ""
+        )
 
         return f"""
 ROLE: Expert HR Analyst specializing in role-fit assessment and career guidance.
@@ -0,0 +1,65 @@
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Tasks live in this process's memory, so async_mode only works when polls reach
+# the process that ran the task. On Vercel each invocation may land on another
+# instance and is cut off at maxDuration, so it is off there by default.
+ASYNC_TASKS_ENABLED = os.getenv("ASYNC_TASKS_ENABLED", "0" if os.getenv("VERCEL") else "1") == "1"
+
+
+class TaskStore:
+    """
+    In-process registry of background analysis tasks.
+    Tracks status and result per task id so clients can poll for completion;
+    finished entries expire after ttl seconds.
+    """
+
+    def __init__(self, ttl: int = 3600, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def create(self, owner: str) -> str:
+        """Register a queued task for owner and return its id."""
+        self._prune()
+        task_id = uuid.uuid4().hex
+        self._tasks[task_id] = {
+            "owner": owner.lower().strip(),
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "updated_at": time.monotonic(),
+        }
+        while len(self._tasks) > self.max_entries:
+            self._tasks.popitem(last=False)
+        return task_id
+
+    def update(self, task_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        """Record a status transition; unknown or evicted ids are ignored."""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return
+        task.update(status=status, result=result, error=error, updated_at=time.monotonic())
+
+    def get(self, task_id: str, owner: str) -> Optional[Dict[str, Any]]:
+        """Return the task if it exists and belongs to owner, else None."""
+        self._prune()
+        task = self._tasks.get(task_id)
+        if task is None or task["owner"] != owner.lower().strip():
+            return None
+        return task
+
+    def _prune(self) -> None:
+        expired_before = time.monotonic() - self.ttl
+        for task_id in [
+            tid for tid, task in self._tasks.items()
+            if task["status"] in ("completed", "failed") and task["updated_at"] < expired_before
+        ]:
+            del self._tasks[task_id]
+
+
+# Global instance
+task_store = TaskStore()
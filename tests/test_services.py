@@ -4,7 +4,7 @@ Tests authentication, resume analysis, rate limiting, and all services
 """
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 from io import BytesIO
 import os
 
@@ -311,6 +311,488 @@ def test_environment_variables(mock_jwt_secret):
     assert len(JWT_SECRET) > 0
 
 
+# ============================================================================
+# ENDPOINT TESTS (MOCKED SERVICES)
+# ============================================================================
+
+def _resume(name):
+    return {"personalInfo": {"name": name}, "workExperience": [], "education": [], "skills": ["Python"], "highlights": []}
+
+
+@pytest.fixture
+def auth_headers(valid_token):
+    return {"Authorization": f"Bearer {valid_token}"}
+
+
+@pytest.fixture
+def shared_services():
+    """Route the router's _shared(cls) lookups to per-test fakes keyed by class name"""
+    from app.routers import resume_router
+
+    fakes = {}
+    with patch.object(resume_router, "_shared", lambda cls: fakes[cls.__name__]):
+        yield fakes
+
+
+def test_compare_resumes_summary_ignores_failed_files(auth_headers, shared_services):
+    """Test a resume that fails validation does not count towards the score summary"""
+    from app.services.rate_limit_service import rate_limit_service
+
+    scores = {"a": 50.0, "b": 99.0, "c": 70.0}
+
+    async def parse(file):
+        name = file.filename[0]
+        # b parses but is missing required sections, so ResumeData rejects it
+        return {"personalInfo": {"name": name}} if name == "b" else _resume(name)
+
+    async def calculate_resume_score(resume_data):
+        return Mock(overall_score=scores[resume_data["personalInfo"]["name"]], strengths=[], weaknesses=[])
+
+    shared_services.update(
+        ResumeParser=Mock(parse=parse),
+        AdvancedAnalyzer=Mock(calculate_resume_score=calculate_resume_score),
+        CompareResumesService=Mock(),
+    )
+    with patch.multiple(
+        rate_limit_service,
+        check_batch_analysis_limit=AsyncMock(return_value={"allowed": True}),
+        increment_compare_resumes_counter=AsyncMock(),
+        get_feature_usage=AsyncMock(return_value={"files_uploaded": 0, "batch_analysis": 0, "compare_resumes": 1}),
+    ):
+        response = client.post(
+            "/api/compare-resumes",
+            headers=auth_headers,
+            files=[("files", (f"{name}.pdf", b"%PDF-1.4", "application/pdf")) for name in "abc"],
+        )
+
+    assert response.status_code == 200
+    summary = response.json()["comparison_summary"]
+    assert summary["successful"] == 2
+    assert summary["failed"] == 1
+    assert summary["highest_score"] == 70.0
+    assert summary["average_score"] == 60.0
+
+
+def _sse_events(body):
+    """Split a text/event-stream body into (event, data) pairs"""
+    import json
+
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields.get("event"), json.loads(fields["data"])))
+    return events
+
+
+def test_batch_analyze_stream_reads_files_and_holds_slot(auth_headers, shared_services):
+    """Test the batch SSE body can still read the uploads and keeps the concurrency slot until it ends"""
+    from app.models.schemas import ResumeScore
+    from app.services.rate_limit_service import rate_limit_service
+
+    slots_during_parse = []
+    score = ResumeScore(
+        overall_score=80, technical_score=80, experience_score=80, education_score=80, communication_score=80,
+        reasoning="", strengths=[], weaknesses=[], improvement_suggestions=[],
+    )
+
+    async def parse(file):
+        content = await file.read()
+        slots_during_parse.append(len(rate_limit_service._in_flight.get("test@example.com", {})))
+        if not content:
+            raise ValueError("No text could be extracted from the file.")
+        return _resume(content.decode())
+
+    shared_services.update(
+        ResumeParser=Mock(parse=parse),
+        BatchAnalyzeService=Mock(build_candidate_profile=Mock(return_value="profile"), generate=AsyncMock(return_value=[])),
+        AdvancedAnalyzer=Mock(analyze_all=AsyncMock(return_value=(score, None, None))),
+    )
+    with patch.multiple(
+        rate_limit_service,
+        check_and_reserve_batch_analysis_limit=AsyncMock(return_value={"allowed": True, "files_allowed": 2}),
+        increment_batch_counter=AsyncMock(),
+        get_feature_usage=AsyncMock(return_value={"files_uploaded": 1, "batch_analysis": 1, "compare_resumes": 0}),
+    ):
+        response = client.post(
+            "/api/batch-analyze",
+            headers={**auth_headers, "Accept": "text/event-stream"},
+            files=[
+                ("files", ("alice.pdf", b"alice", "application/pdf")),
+                ("files", ("empty.pdf", b"", "application/pdf")),
+            ],
+        )
+
+    assert response.status_code == 200
+    events = _sse_events(response.text)
+    results = {data["file_name"]: data for event, data in events if event is None}
+    assert results["alice.pdf"]["status"] == "success"
+    assert results["empty.pdf"]["status"] == "validation_error"
+    assert events[-1][0] == "summary"
+    assert events[-1][1]["batch_summary"]["successful"] == 1
+    assert slots_during_parse == [1, 1]
+    assert "test@example.com" not in rate_limit_service._in_flight
+
+
+@pytest.mark.asyncio
+async def test_batch_stream_releases_holds_if_body_never_starts(shared_services):
+    """Test the batch stream's quota reservation and slot are freed even if the body is never iterated"""
+    from fastapi import UploadFile
+    from starlette.requests import Request
+    from app.dependencies.auth import TokenData
+    from app.routers.resume_router import batch_analyze_resumes
+    from app.services.rate_limit_service import rate_limit_service
+
+    email = "stream-never-started@example.com"
+    request = Request({"type": "http", "method": "POST", "path": "/api/batch-analyze",
+                       "headers": [(b"accept", b"text/event-stream")]})
+    request.state.concurrency_slot = await rate_limit_service.acquire_concurrency_slot(email)
+    shared_services.update(ResumeParser=Mock(), BatchAnalyzeService=Mock(), AdvancedAnalyzer=Mock())
+
+    with patch.object(rate_limit_service, "check_batch_analysis_limit",
+                      AsyncMock(return_value={"allowed": True, "files_allowed": 1})):
+        response = await batch_analyze_resumes(
+            files=[UploadFile(BytesIO(b"resume"), filename="a.pdf")],
+            request=request,
+            target_role=None,
+            job_description=None,
+            current_user=TokenData(user_id="u1", email=email),
+        )
+
+    assert ("batch_analysis", email) in rate_limit_service._reservations
+    # The client went away before Starlette iterated the body; only the background task runs
+    await response.background()
+
+    assert ("batch_analysis", email) not in rate_limit_service._reservations
+    assert email not in rate_limit_service._in_flight
+
+
+def _analysis():
+    """Score, personality and career sections as AdvancedAnalyzer.analyze_all returns them"""
+    from app.models.schemas import CareerPathPrediction, PersonalityInsights, ResumeScore
+
+    return (
+        ResumeScore(
+            overall_score=80, technical_score=80, experience_score=80, education_score=80, communication_score=80,
+            reasoning="", strengths=[], weaknesses=[], improvement_suggestions=[],
+        ),
+        PersonalityInsights(traits={}, work_style="", leadership_potential=50, team_player_score=50, analysis=""),
+        CareerPathPrediction(current_level="Mid", next_roles=[], timeline="", required_development=[]),
+    )
+
+
+@pytest.fixture
+def hiredesk_services(shared_services):
+    """Fakes for every service the hiredesk route calls; parse returns a valid resume"""
+    from app.models.schemas import RoleRecommendation
+
+    shared_services.update(
+        ResumeParser=Mock(parse=AsyncMock(return_value=_resume("Jane"))),
+        HiredeskService=Mock(
+            build_candidate_profile=Mock(return_value="profile"),
+            generate=AsyncMock(return_value=[RoleRecommendation(roleName="Engineer", matchPercentage=90, reasoning="")]),
+            analyze_role_fit=AsyncMock(return_value={"fit": True, "reasoning": "Strong match"}),
+            generate_interview_questions=AsyncMock(return_value=[]),
+        ),
+        AdvancedAnalyzer=Mock(analyze_all=AsyncMock(return_value=_analysis())),
+    )
+    return shared_services
+
+
+@pytest.fixture
+def upload_quota():
+    """Allow every upload and record the filesUploaded increments"""
+    from app.services.rate_limit_service import rate_limit_service
+
+    increment = AsyncMock()
+    with patch.multiple(
+        rate_limit_service,
+        check_and_reserve_upload_limit=AsyncMock(return_value={"allowed": True}),
+        increment_files_uploaded=increment,
+    ):
+        yield increment
+
+
+def _hiredesk_post(headers, content, **form):
+    return client.post(
+        "/api/hiredesk-analyze",
+        headers=headers,
+        files={"file": ("resume.pdf", content, "application/pdf")},
+        data={"target_role": "Engineer", "job_description": "Build APIs", **form},
+    )
+
+
+def test_hiredesk_async_mode_completes_and_holds_slot(auth_headers, hiredesk_services, upload_quota):
+    """Test a background task completes, charges the upload once and holds the slot until done"""
+    from app.services.rate_limit_service import rate_limit_service
+
+    calls = []
+
+    async def analyze_all(resume_data, profile=None):
+        calls.append(len(rate_limit_service._in_flight.get("test@example.com", {})))
+        return _analysis()
+
+    hiredesk_services["AdvancedAnalyzer"].analyze_all = analyze_all
+    response = _hiredesk_post(auth_headers, b"async completes", async_mode="true")
+
+    assert response.status_code == 202
+    task_id = response.json()["task_id"]
+
+    status_response = client.get(f"/api/tasks/{task_id}", headers=auth_headers)
+    assert status_response.status_code == 200
+    body = status_response.json()
+    assert body["status"] == "completed"
+    assert body["result"]["best_fit_role"] == "Engineer"
+    assert calls == [1]
+    assert "test@example.com" not in rate_limit_service._in_flight
+    upload_quota.assert_awaited_once()
+
+
+def test_hiredesk_async_mode_fails_fast_without_charging(auth_headers, hiredesk_services, upload_quota):
+    """Test a resume that fails validation fails the task without retrying and is not charged"""
+    hiredesk_services["ResumeParser"].parse.return_value = {"personalInfo": {"name": "Jane"}}
+
+    response = _hiredesk_post(auth_headers, b"async invalid", async_mode="true")
+    assert response.status_code == 202
+
+    body = client.get(f"/api/tasks/{response.json()['task_id']}", headers=auth_headers).json()
+    assert body["status"] == "failed"
+    assert body["success"] is False
+    hiredesk_services["AdvancedAnalyzer"].analyze_all.assert_awaited_once()
+    upload_quota.assert_not_awaited()
+
+
+def test_hiredesk_async_mode_rejected_when_disabled(auth_headers, hiredesk_services, upload_quota):
+    """Test async_mode is refused where the in-process task store cannot be polled"""
+    with patch("app.routers.resume_router.ASYNC_TASKS_ENABLED", False):
+        response = _hiredesk_post(auth_headers, b"async disabled", async_mode="true")
+
+    assert response.status_code == 422
+    assert response.json()["detail"]["error"] == "ASYNC_MODE_UNSUPPORTED"
+    hiredesk_services["ResumeParser"].parse.assert_not_awaited()
+
+
+def test_task_status_unknown_or_foreign_task(auth_headers):
+    """Test polling an unknown task id, or another user's task, returns 404"""
+    from app.services.task_store import task_store
+
+    assert client.get("/api/tasks/does-not-exist", headers=auth_headers).status_code == 404
+
+    foreign_task = task_store.create("someone-else@example.com")
+    response = client.get(f"/api/tasks/{foreign_task}", headers=auth_headers)
+    assert response.status_code == 404
+    assert response.json()["detail"]["error"] == "NOT_FOUND"
+
+
+def test_hiredesk_etag_cache(auth_headers, hiredesk_services, upload_quota):
+    """Test a repeat upload is served from cache, If-None-Match gets 304, and a new job description misses"""
+    parse = hiredesk_services["ResumeParser"].parse
+
+    first = _hiredesk_post(auth_headers, b"etag resume")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    repeat = _hiredesk_post(auth_headers, b"etag resume")
+    assert repeat.status_code == 200
+    assert repeat.headers["ETag"] == etag
+    assert repeat.json() == first.json()
+    assert parse.await_count == 1
+
+    not_modified = _hiredesk_post({**auth_headers, "If-None-Match": etag}, b"etag resume")
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert parse.await_count == 1
+
+    changed = _hiredesk_post(auth_headers, b"etag resume", job_description="Build data pipelines")
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert parse.await_count == 2
+    assert upload_quota.await_count == 2
+
+
+def test_concurrent_limit_rejects_second_request_and_frees_slot_on_error(auth_headers, hiredesk_services, upload_quota):
+    """Test a second in-flight request gets 429 and a failed request gives its slot back"""
+    import asyncio
+    import threading
+    from app.services.rate_limit_service import rate_limit_service
+
+    entered, release = threading.Event(), threading.Event()
+
+    async def slow_parse(file):
+        entered.set()
+        await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+        raise ValueError("Failed to read PDF file")
+
+    hiredesk_services["ResumeParser"].parse = slow_parse
+    responses = {}
+
+    with patch.object(rate_limit_service, "concurrent_request_limit", 1):
+        first = threading.Thread(target=lambda: responses.update(first=_hiredesk_post(auth_headers, b"slot one")))
+        first.start()
+        try:
+            assert entered.wait(5)
+            second = _hiredesk_post(auth_headers, b"slot two")
+        finally:
+            release.set()
+            first.join(5)
+
+        assert second.status_code == 429
+        assert second.json()["detail"]["error"] == "CONCURRENT_LIMIT_EXCEEDED"
+        assert responses["first"].status_code == 500
+        assert "test@example.com" not in rate_limit_service._in_flight
+
+        hiredesk_services["ResumeParser"].parse = AsyncMock(return_value=_resume("Jane"))
+        assert _hiredesk_post(auth_headers, b"slot three").status_code == 200
+
+
+@pytest.fixture
+def analyze_services(shared_services):
+    """Fakes for the analyze-resume route; each section resolves after the given delay"""
+    import asyncio
+    from app.routers import resume_router
+
+    def after(delay, value):
+        async def section(*args, **kwargs):
+            await asyncio.sleep(delay)
+            if isinstance(value, Exception):
+                raise value
+            return value
+        return section
+
+    shared_services.update(
+        ResumeParser=Mock(parse=AsyncMock(return_value=_resume("Jane"))),
+        AnalyzeResumeService=Mock(
+            build_candidate_profile=Mock(return_value="profile"),
+            generate_role_preparation_plan=after(0, {"steps": ["Learn Go"]}),
+            calculate_resume_score=after(0.05, {"overall_score": 80}),
+            analyze_personality=after(0.1, {"work_style": "Independent"}),
+            predict_career_path=after(0.15, {"current_level": "Mid"}),
+            analyze_role_fit=after(0.2, [{"roleName": "Engineer"}]),
+        ),
+    )
+    resume_router.limiter.reset()
+    yield shared_services["AnalyzeResumeService"], after
+
+
+def _analyze_stream():
+    return client.post(
+        "/api/analyze-resume",
+        headers={"Accept": "text/event-stream"},
+        files={"file": ("resume.pdf", b"%PDF-1.4", "application/pdf")},
+        data={"target_role": "Engineer"},
+    )
+
+
+def test_analyze_resume_stream_sends_sections_as_they_finish(analyze_services):
+    """Test each section is streamed in completion order, followed by a done event"""
+    response = _analyze_stream()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response.text)
+    assert [event for event, _ in events] == [
+        "preparationPlan", "resumeScore", "personalityInsights", "careerPath", "roleRecommendations", "done"
+    ]
+    assert events[1][1] == {"overall_score": 80}
+    assert events[4][1] == [{"roleName": "Engineer"}]
+    assert events[-1][1] == {"success": True}
+
+
+def test_analyze_resume_stream_reports_failed_section(analyze_services):
+    """Test a failing section ends the stream with an error event instead of done"""
+    service, after = analyze_services
+    service.analyze_personality = after(0.1, ValueError("Failed to analyze personality"))
+
+    response = _analyze_stream()
+
+    assert response.status_code == 200
+    events = _sse_events(response.text)
+    assert [event for event, _ in events] == ["preparationPlan", "resumeScore", "error"]
+    assert events[-1][1] == {"success": False, "message": "Failed to analyze personality", "error": "SERVER_ERROR"}
+
+
+def test_hiredesk_discards_speculative_fit_for_other_role(auth_headers, hiredesk_services, upload_quota):
+    """Test the speculative target-role fit is cancelled and awaited when another role ranks first"""
+    import asyncio
+
+    fit_calls = []
+
+    async def analyze_role_fit(resume_data, role, job_description, profile=None):
+        fit_calls.append(role)
+        if role == "Engineer":
+            try:
+                await asyncio.sleep(10)
+            finally:
+                fit_calls.append("speculative cleanup")
+        return {"fit": False, "reasoning": f"Checked {role}"}
+
+    service = hiredesk_services["HiredeskService"]
+    service.analyze_role_fit = analyze_role_fit
+    service.generate.return_value[0].roleName = "Data Scientist"
+
+    response = _hiredesk_post(auth_headers, b"speculative fit")
+
+    assert response.status_code == 200
+    assert response.json()["best_fit_role"] == "Data Scientist"
+    # The cancelled task has finished unwinding before the real fit check starts
+    assert fit_calls == ["Engineer", "speculative cleanup", "Data Scientist"]
+
+
+@pytest.mark.asyncio
+async def test_analyze_resume_stream_starts_sections_only_when_iterated(analyze_services):
+    """Test no section call is made if the client goes away before the stream body starts"""
+    from starlette.requests import Request
+    from fastapi import UploadFile
+    from app.routers.resume_router import analyze_resume
+
+    service, _ = analyze_services
+    service.calculate_resume_score = Mock()
+    request = Request({"type": "http", "method": "POST", "path": "/api/analyze-resume", "client": ("127.0.0.1", 1),
+                       "headers": [(b"accept", b"text/event-stream")]})
+
+    response = await analyze_resume(
+        file=UploadFile(BytesIO(b"%PDF-1.4"), filename="resume.pdf"),
+        request=request,
+        target_role="Engineer",
+        job_description=None,
+    )
+
+    assert response.media_type == "text/event-stream"
+    service.calculate_resume_score.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_stream_sections_collects_cancelled_siblings():
+    """Test sections cancelled after a failure are awaited, so their errors are never left unretrieved"""
+    import asyncio
+    import gc
+    from app.routers.resume_router import _stream_sections
+
+    unretrieved = []
+    loop = asyncio.get_running_loop()
+    loop.set_exception_handler(lambda loop, context: unretrieved.append(context))
+
+    async def fails():
+        raise ValueError("Failed to score resume")
+
+    async def fails_when_cancelled():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            raise ValueError("Failed while shutting down")
+
+    try:
+        events = [event async for event in _stream_sections({"resumeScore": fails, "careerPath": fails_when_cancelled})]
+        # Give a cancelled-but-unawaited sibling time to finish before collecting it
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        gc.collect()
+    finally:
+        loop.set_exception_handler(None)
+
+    assert events[-1].startswith("event: error")
+    assert unretrieved == []
+
+
 # ============================================================================
 # CLEANUP
 # ============================================================================
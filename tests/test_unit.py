@@ -3,7 +3,7 @@ Unit tests for individual services
 Tests resume parser, role recommender, question generator, and rate limiter
 """
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 from io import BytesIO
 
 
@@ -59,6 +59,43 @@ startxref
             assert "experience" in result
             assert "skills" in result
 
+    @pytest.mark.asyncio
+    async def test_same_resume_text_is_structured_once(self, parser):
+        """Test re-parsing identical text reuses the cached Gemini result"""
+        parser._model = Mock()
+        parser._model.generate_content_async = AsyncMock(
+            return_value=Mock(text='{"personalInfo": {"name": "Jane"}, "skills": ["Python"]}')
+        )
+
+        first = await parser._analyze_with_gemini("Jane Doe, Python engineer")
+        first["skills"].append("Go")
+        second = await parser._analyze_with_gemini("Jane Doe, Python engineer")
+
+        assert second == {"personalInfo": {"name": "Jane"}, "skills": ["Python"]}
+        assert parser._model.generate_content_async.await_count == 1
+
+
+    @pytest.mark.asyncio
+    async def test_extract_text_replaces_broken_process_pool(self, parser):
+        """Test a pool whose worker died is discarded and the extraction retried on a new one"""
+        from concurrent.futures import ThreadPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        from fastapi import UploadFile
+        from app.services import resume_parser
+
+        broken = Mock()
+        broken.submit.side_effect = BrokenProcessPool("worker died")
+        fresh = ThreadPoolExecutor(max_workers=1)
+        pools = iter([broken, fresh])
+        file = UploadFile(filename="resume.pdf", file=BytesIO(b"%PDF"))
+
+        with patch.object(resume_parser, "_get_extract_pool", lambda: next(pools)), \
+                patch.object(resume_parser, "extract_text", return_value="Jane Doe"):
+            text = await parser._extract_text(file)
+
+        fresh.shutdown()
+        assert text == "Jane Doe"
+        broken.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
 
 # ============================================================================
 # ROLE RECOMMENDER TESTS
@@ -183,6 +220,246 @@ class TestAdvancedAnalyzer:
         """Test analyzer initializes correctly"""
         assert analyzer is not None
 
+    @pytest.mark.asyncio
+    async def test_repeated_resume_reuses_cached_score(self, analyzer):
+        """Test identical resume data is scored by the model only once"""
+        score_json = (
+            '{"overall_score": 80, "technical_score": 80, "experience_score": 80, '
+            '"education_score": 80, "communication_score": 80, "reasoning": "Solid", '
+            '"strengths": [], "weaknesses": [], "improvement_suggestions": []}'
+        )
+        analyzer._model = Mock()
+        analyzer._model.generate_content_async = AsyncMock(return_value=Mock(text=score_json))
+        resume_data = {"skills": ["Python"], "workExperience": [], "education": []}
+
+        first = await analyzer.calculate_resume_score(resume_data)
+        second = await analyzer.calculate_resume_score(dict(resume_data))
+
+        assert first is second
+        assert analyzer._model.generate_content_async.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_analyze_all_uses_one_model_call(self, analyzer):
+        """Test score, personality and career path come from a single fused call"""
+        combined_json = (
+            '{"score": {"overall_score": 80, "technical_score": 80, "experience_score": 80, '
+            '"education_score": 80, "communication_score": 80, "reasoning": "Solid", '
+            '"strengths": [], "weaknesses": [], "improvement_suggestions": []}, '
+            '"personality": {"traits": {"openness": 70}, "work_style": "Analytical", '
+            '"leadership_potential": 60, "team_player_score": 75, "analysis": "Focused"}, '
+            '"career_path": {"current_level": "Mid Level", "next_roles": ["Senior Engineer"], '
+            '"timeline": "2-3 years", "required_development": []}}'
+        )
+        analyzer._model = Mock()
+        analyzer._model.generate_content_async = AsyncMock(return_value=Mock(text=combined_json))
+        resume_data = {"skills": ["Go"], "workExperience": [], "education": []}
+
+        score, personality, career_path = await analyzer.analyze_all(resume_data)
+
+        assert score.overall_score == 80
+        assert personality.work_style == "Analytical"
+        assert career_path.current_level == "Mid Level"
+        assert analyzer._model.generate_content_async.await_count == 1
+        assert await analyzer.calculate_resume_score(resume_data) is score
+
+    @pytest.mark.asyncio
+    async def test_analyze_all_hashes_resume_once(self, analyzer):
+        """Test the cache lookup and store in analyze_all share one resume digest"""
+        analyzer._model = Mock()
+        analyzer._model.generate_content_async = AsyncMock(return_value=Mock(text=(
+            '{"score": {"overall_score": 80, "technical_score": 80, "experience_score": 80, '
+            '"education_score": 80, "communication_score": 80, "reasoning": "Solid", '
+            '"strengths": [], "weaknesses": [], "improvement_suggestions": []}, '
+            '"personality": {"traits": {}, "work_style": "Analytical", '
+            '"leadership_potential": 60, "team_player_score": 75, "analysis": "Focused"}, '
+            '"career_path": {"current_level": "Mid Level", "next_roles": [], '
+            '"timeline": "2-3 years", "required_development": []}}'
+        )))
+
+        with patch.object(analyzer, "_resume_digest", wraps=analyzer._resume_digest) as digest:
+            await analyzer.analyze_all({"skills": ["Rust"], "workExperience": [], "education": []})
+
+        assert digest.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_analyze_batch_scores_resumes_in_one_call(self, analyzer):
+        """Test a batch of resumes is analyzed by one combined call and mapped back by resume id"""
+        def entry(resume_id, level):
+            return (
+                '{"resume_id": ' + str(resume_id) + ', "score": {"overall_score": 70, "technical_score": 70, "experience_score": 70, '
+                '"education_score": 70, "communication_score": 70, "reasoning": "Ok", '
+                '"strengths": [], "weaknesses": [], "improvement_suggestions": []}, '
+                '"personality": {"traits": {}, "work_style": "Independent", '
+                '"leadership_potential": 50, "team_player_score": 50, "analysis": "Calm"}, '
+                '"career_path": {"current_level": "' + level + '", "next_roles": [], '
+                '"timeline": "1 year", "required_development": []}}'
+            )
+        analyzer._model = Mock()
+        analyzer._model.generate_content_async = AsyncMock(
+            # Entries come back out of resume order
+            return_value=Mock(text='{"analyses": [' + entry(2, "Executive") + ', ' + entry(1, "Entry Level") + ']}')
+        )
+        resumes = [{"skills": ["Excel"]}, {"skills": ["Strategy"]}]
+
+        analyses = await analyzer.analyze_batch(resumes)
+
+        assert [career.current_level for _, _, career in analyses] == ["Entry Level", "Executive"]
+        assert analyzer._model.generate_content_async.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_dropped_connections_are_retried_and_counted(self):
+        """Test network errors reaching Gemini are retried and count towards the breaker"""
+        from app.services.prompts import base_prompt_service
+        from app.services.prompts.base_prompt_service import GeminiCircuitBreaker, generate_content
+
+        model = Mock()
+        model.generate_content_async = AsyncMock(side_effect=[ConnectionResetError("reset"), Mock(text="{}")])
+        breaker = GeminiCircuitBreaker(fail_max=5, reset_timeout=60)
+        breaker.record_success = Mock()
+        with patch.object(base_prompt_service, "gemini_breaker", breaker), \
+                patch("asyncio.sleep", new=AsyncMock()):
+            response = await generate_content(model, "prompt")
+
+        assert response.text == "{}"
+        assert model.generate_content_async.await_count == 2
+        assert breaker._failures == 1
+
+    @pytest.mark.asyncio
+    async def test_transient_gemini_errors_are_retried(self):
+        """Test quota errors are retried with backoff and the breaker sheds load"""
+        from google.api_core.exceptions import ResourceExhausted
+        from app.services.prompts import base_prompt_service
+        from app.services.prompts.base_prompt_service import (
+            GeminiCircuitBreaker, GeminiUnavailableError, generate_content
+        )
+
+        model = Mock()
+        model.generate_content_async = AsyncMock(side_effect=[ResourceExhausted("quota"), Mock(text="{}")])
+        breaker = GeminiCircuitBreaker(fail_max=2, reset_timeout=60)
+        with patch.object(base_prompt_service, "gemini_breaker", breaker), \
+                patch("asyncio.sleep", new=AsyncMock()):
+            response = await generate_content(model, "prompt")
+            assert response.text == "{}"
+            assert model.generate_content_async.await_count == 2
+
+            breaker.record_failure()
+            breaker.record_failure()
+            with pytest.raises(GeminiUnavailableError):
+                await generate_content(model, "prompt")
+
+    def test_years_experience_comes_from_durations(self, analyzer):
+        """Test years of experience are summed from parsed duration strings"""
+        experience = [
+            {"title": "Engineer", "duration": "Jan 2018 - Jan 2021"},
+            {"title": "Intern", "duration": "2017"},
+            {"title": "Volunteer", "duration": "Weekends"},
+        ]
+
+        assert analyzer.duration_months("03/2019 - 05/2021") == 26
+        assert analyzer.format_years_experience(experience) == "Approximately 4"
+        assert analyzer.format_years_experience([{"duration": "n/a"}]) == "Not stated"
+
+    def test_words_starting_like_months_are_not_read_as_months(self, analyzer):
+        """Test only real month names and abbreviations set the month of a date"""
+        assert analyzer.duration_months("Marketing 2020 - 2021") == 12
+        assert analyzer.duration_months("Mar 2020 - Jan 2021") == 10
+        assert analyzer.duration_months("September 2019 - Sept. 2020") == 12
+
+    def test_long_text_is_trimmed_to_token_budget(self):
+        """Test oversized prompt input is cut on a word boundary within budget"""
+        from app.services.prompts.base_prompt_service import CHARS_PER_TOKEN, fit_to_token_budget
+
+        text = "responsibility " * 1000
+
+        trimmed = fit_to_token_budget(text, 100)
+
+        assert len(trimmed) <= 100 * CHARS_PER_TOKEN + 4
+        assert trimmed.endswith("responsibility ...")
+        assert fit_to_token_budget("short", 100) == "short"
+
+    def test_parse_json_response_recovers_wrapped_json(self, analyzer):
+        """Test JSON wrapped in prose is sliced out, ignoring braces inside strings"""
+        text = 'Here is the JSON:\n{"reasoning": "uses {braces} and \\"quotes\\"", "score": 1}\nDone.'
+
+        assert analyzer.parse_json_response(text) == {"reasoning": 'uses {braces} and "quotes"', "score": 1}
+        with pytest.raises(ValueError):
+            analyzer.parse_json_response("no json here")
+
+
+# ============================================================================
+# ANALYZE RESUME SERVICE TESTS
+# ============================================================================
+
+class TestAnalyzeResumeService:
+    """Test suite for AnalyzeResumeService"""
+
+    @pytest.mark.asyncio
+    async def test_analyze_all_uses_one_model_call(self):
+        """Test recommendations, score, personality and career path come from one call"""
+        from app.services.prompts.analyze_resume_service import AnalyzeResumeService
+
+        combined_json = (
+            '{"roleRecommendations": [{"roleName": "Data Engineer", "matchPercentage": 82, '
+            '"reasoning": "Strong Python", "requiredSkills": ["Python"], "missingSkills": ["Spark"]}], '
+            '"resumeScore": {"overall_score": 80, "technical_score": 80, "experience_score": 80, '
+            '"education_score": 80, "communication_score": 80, "reasoning": "Solid", '
+            '"strengths": [], "weaknesses": [], "improvement_suggestions": []}, '
+            '"personalityInsights": {"traits": {"openness": 70}, "work_style": "Analytical", '
+            '"leadership_potential": 60, "team_player_score": 75, "analysis": "Focused"}, '
+            '"careerPath": {"current_level": "Mid Level", "next_roles": ["Senior Engineer"], '
+            '"timeline": "2-3 years", "required_development": []}}'
+        )
+        service = AnalyzeResumeService()
+        service._model = Mock()
+        service._model.generate_content_async = AsyncMock(return_value=Mock(text=combined_json))
+        resume_data = {"skills": ["Python"], "workExperience": [], "education": []}
+
+        sections = await service.analyze_all(resume_data, target_role="Data Engineer")
+
+        assert sections.roleRecommendations[0].roleName == "Data Engineer"
+        assert sections.resumeScore.overall_score == 80
+        assert sections.careerPath.current_level == "Mid Level"
+        assert service._model.generate_content_async.await_count == 1
+        assert "TARGET ROLE: Data Engineer" in service._model.generate_content_async.await_args.args[0]
+
+    def test_combined_prompt_keeps_five_general_roles(self):
+        """Test the fused prompt's top-3 limit does not cap the five general role recommendations"""
+        from app.services.prompts.analyze_resume_service import AnalyzeResumeService
+
+        prompt = AnalyzeResumeService()._create_combined_prompt({"skills": ["Python"], "workExperience": [], "education": []})
+
+        assert "Exactly 5 roles" in prompt
+        assert "Lists top 3 only" not in prompt
+        assert '"roleRecommendations": [' in prompt and '"careerPath": {' in prompt
+
+    @pytest.mark.asyncio
+    async def test_analyze_all_parallel_runs_sections_concurrently(self):
+        """Test the per-section fallback issues all four calls at once"""
+        import asyncio
+        from app.services.prompts.analyze_resume_service import AnalyzeResumeService
+
+        service = AnalyzeResumeService()
+        in_flight = []
+
+        def section(result):
+            async def call(*args, **kwargs):
+                in_flight.append(result)
+                await asyncio.sleep(0)
+                assert len(in_flight) == 4
+                return result
+            return call
+
+        service.generate = section([])
+        service.calculate_resume_score = section("score")
+        service.analyze_personality = section("personality")
+        service.predict_career_path = section("career")
+
+        sections = await service.analyze_all_parallel({"skills": ["Python"]})
+
+        assert sections.roleRecommendations == []
+        assert sections.resumeScore == "score"
+        assert sections.careerPath == "career"
+
 
 # ============================================================================
 # RATE LIMIT SERVICE TESTS
@@ -240,6 +517,206 @@ class TestRateLimitService:
             assert result["allowed"] is False
             assert result["remaining"] == 0
 
+    @pytest.mark.asyncio
+    async def test_concurrency_slots_reject_and_release(self):
+        """Test that in-flight slots are bounded per user and freed on release"""
+        from app.services.rate_limit_service import RateLimitService
+
+        limiter = RateLimitService()
+        request_id = await limiter.acquire_concurrency_slot("user@example.com", max_inflight=1)
+        assert request_id is not None
+        assert await limiter.acquire_concurrency_slot("User@Example.com", max_inflight=1) is None
+
+        await limiter.release_concurrency_slot("user@example.com", request_id)
+        assert limiter._in_flight == {}
+        assert await limiter.acquire_concurrency_slot("user@example.com", max_inflight=1) is not None
+
+    @pytest.mark.asyncio
+    async def test_reserved_uploads_count_towards_limit(self):
+        """Test that a reserved upload blocks a concurrent request for the last slot"""
+        from app.services.rate_limit_service import RateLimitService
+
+        limiter = RateLimitService()
+        status = {"allowed": True, "current_count": 9, "limit": 10, "remaining": 1}
+        with patch.object(limiter, 'check_files_uploaded_limit', return_value=status):
+            first = await limiter.check_and_reserve_upload_limit("test@example.com")
+            second = await limiter.check_and_reserve_upload_limit("test@example.com")
+            assert first["allowed"] is True
+            assert second["allowed"] is False
+
+            limiter.release_reservation("files_uploaded", "test@example.com")
+            third = await limiter.check_and_reserve_upload_limit("test@example.com")
+            assert third["allowed"] is True
+
+
+# ============================================================================
+# RESPONSE CACHE TESTS
+# ============================================================================
+
+class TestResponseCache:
+    """Test suite for the in-process response cache"""
+    
+    def test_cache_hit_and_miss(self):
+        """Test cached values are returned per user and hash"""
+        from app.services.response_cache import ResponseCache
+        
+        cache = ResponseCache(ttl=60)
+        key = cache.make_key("Test@Example.com", "abc123")
+        
+        assert key == "resume:test@example.com:abc123"
+        assert cache.get(key) is None
+        
+        cache.set(key, {"success": True})
+        assert cache.get(key) == {"success": True}
+    
+    def test_cache_expiry_and_eviction(self):
+        """Test expired entries are dropped and size is bounded"""
+        from app.services.response_cache import ResponseCache
+        
+        cache = ResponseCache(ttl=0)
+        cache.set("expired", 1)
+        assert cache.get("expired") is None
+        
+        cache = ResponseCache(ttl=60, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+        assert cache.get("a") is None
+        assert cache.get("c") == "c"
+
+
+# ============================================================================
+# TASK STORE TESTS
+# ============================================================================
+
+class TestTaskStore:
+    """Test suite for the background task store"""
+
+    def test_task_lifecycle(self):
+        """Test tasks move through statuses and are visible only to their owner"""
+        from app.services.task_store import TaskStore
+
+        store = TaskStore()
+        task_id = store.create("Owner@Example.com")
+
+        assert store.get(task_id, "owner@example.com")["status"] == "queued"
+        assert store.get(task_id, "other@example.com") is None
+
+        store.update(task_id, "completed", result={"success": True})
+        task = store.get(task_id, "owner@example.com")
+        assert task["status"] == "completed"
+        assert task["result"] == {"success": True}
+
+    def test_finished_tasks_expire(self):
+        """Test completed tasks are pruned after the TTL"""
+        from app.services.task_store import TaskStore
+
+        store = TaskStore(ttl=0)
+        task_id = store.create("owner@example.com")
+        store.update(task_id, "failed", error="boom")
+
+        assert store.get(task_id, "owner@example.com") is None
+
+
+# ============================================================================
+# CANDIDATE SELECTOR TESTS
+# ============================================================================
+
+class TestCandidateSelector:
+    """Test suite for CandidateSelector"""
+
+    @staticmethod
+    def _files(*names):
+        files = []
+        for name in names:
+            file = Mock(filename=name)
+            file.seek = AsyncMock()
+            files.append(file)
+        return files
+
+    @pytest.mark.asyncio
+    async def test_candidates_keep_upload_order_and_failures_reject(self):
+        """Test readable resumes are evaluated together and results keep upload order"""
+        from app.services.candidate_selector import CandidateSelector
+
+        parser = Mock()
+        parser._extract_text = AsyncMock(side_effect=["python resume", ValueError("bad pdf"), "java resume"])
+        selector_service = Mock()
+        selector_service.evaluate_candidates_batch = AsyncMock(return_value=[
+            {"status": "FIT", "message": "Knows Python"},
+            {"status": "REJECT", "message": "No Python"},
+        ])
+        selector = CandidateSelector(parser=parser, selector_service=selector_service)
+
+        results = await selector.evaluate_candidates(self._files("a.pdf", "b.pdf", "c.pdf"), "Engineer", ["python"])
+
+        assert [r["candidate"] for r in results] == ["a.pdf", "b.pdf", "c.pdf"]
+        assert [r["status"] for r in results] == ["FIT", "REJECT", "REJECT"]
+        selector_service.evaluate_candidates_batch.assert_awaited_once_with(
+            ["python resume", "java resume"], "Engineer", ["python"]
+        )
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk_falls_back_without_redoing_other_chunks(self):
+        """Test only the chunk with a bad reply is re-evaluated one candidate at a time"""
+        from app.services.prompts.candidate_selection_service import CandidateSelectionService
+
+        def reply(prompt):
+            if "Candidate 2:\nbad chunk" in prompt:
+                return Mock(text='{"candidates": []}')
+            if "Candidate 2:" in prompt:
+                return Mock(text=(
+                    '{"candidates": [{"candidate_id": 1, "status": "FIT", "message": "Batch"}, '
+                    '{"candidate_id": 2, "status": "FIT", "message": "Batch"}]}'
+                ))
+            if "unreadable" in prompt:
+                raise ValueError("model error")
+            return Mock(text='{"status": "REJECT", "message": "Single"}')
+
+        service = CandidateSelectionService()
+        service.BATCH_SIZE = 2
+        service._model = Mock()
+        service._model.generate_content_async = AsyncMock(side_effect=reply)
+
+        decisions = await service.evaluate_candidates_batch(
+            ["good one", "good two", "unreadable", "bad chunk"], "Engineer", ["python"]
+        )
+
+        assert [d["message"] for d in decisions[:2]] == ["Batch", "Batch"]
+        assert decisions[2]["status"] == "REJECT" and decisions[2]["message"].startswith("Could not parse file")
+        assert decisions[3] == {"status": "REJECT", "message": "Single"}
+        # Two combined calls plus single calls for the failed chunk only
+        assert service._model.generate_content_async.await_count == 4
+
+    @pytest.mark.asyncio
+    async def test_batch_decisions_map_back_by_candidate_id(self):
+        """Test one model call scores a batch and decisions follow candidate ids"""
+        from app.services.prompts.candidate_selection_service import CandidateSelectionService
+
+        service = CandidateSelectionService()
+        service._model = Mock()
+        service._model.generate_content_async = AsyncMock(return_value=Mock(text=(
+            '{"candidates": [{"candidate_id": 2, "status": "reject", "message": "No Python"}, '
+            '{"candidate_id": 1, "status": "FIT", "message": "Knows Python"}]}'
+        )))
+
+        decisions = await service.evaluate_candidates_batch(["python resume", "java resume"], "Engineer", ["python"])
+
+        assert decisions == [
+            {"status": "FIT", "message": "Knows Python"},
+            {"status": "REJECT", "message": "No Python"},
+        ]
+        assert service._model.generate_content_async.await_count == 1
+
+
+    def test_decision_message_is_coerced_to_text(self):
+        """Test non-string or missing messages do not break the 100-char trim"""
+        from app.services.prompts.candidate_selection_service import CandidateSelectionService
+
+        normalize = CandidateSelectionService._normalize_decision
+
+        assert normalize({"status": "fit", "message": 42}) == {"status": "FIT", "message": "42"}
+        assert normalize({"status": "FIT", "message": None}) == {"status": "FIT", "message": "Could not evaluate"}
+        assert normalize({"status": "maybe", "message": ["x" * 150]})["message"] == str(["x" * 150])[:100]
 
 # ============================================================================
 # AUTHENTICATION TESTS